@@ -3,7 +3,15 @@ from .random_engine import RandomEngine
 from .heckmeck_engine import HeckmeckEngine
 from .annotated_move import AnnotatedMove
 from .evaluation import Evaluation
+from .nnue import Network
 from .heckmeck_board import HeckmeckBoard
 from .score import Score
-from .search_node import SearchNode
 from .search_tree import SearchTree
+from .transposition_table import TranspositionTable, TranspositionEntry, Bound
+from .search_mode import SearchMode
+from .search_statistics import SearchStatistics
+from .lazy_smp import LazySMP
+from .root_split import RootSplitPool
+from .parallel_mode import ParallelMode
+from .search_limits import SearchLimits
+from .search_info import SearchInfo
@@ -10,9 +10,17 @@ class Engine(ABC):
     def __init__(self):
         self.board = None
         self.game_started = None
+        self.ponder_move = None
 
     @abstractmethod
-    def play(self, iteration_callback=None) -> chess.Move:
+    def play(
+        self,
+        iteration_callback=None,
+        limits=None,
+        stop_event=None,
+        ponderhit_event=None,
+        info_callback=None,
+    ) -> chess.Move:
         pass
 
     @property
@@ -25,6 +33,12 @@ class Engine(ABC):
     def author(self):
         pass
 
+    def set_option(self, name: str, value: str):
+        logging.warning(f"Ignoring unknown option {name}")
+
+    def close(self):
+        pass
+
     def ucinewgame(self):
         self.board = chess.Board()
         self.game_started = False
@@ -2,10 +2,27 @@ import chess
 import numpy as np
 from enum import Enum
 
-from typing import Optional
+from typing import Iterable, Optional
 
-from heckmeckengine.engine.score import Score
+from heckmeckengine.engine.score import CENTIPAWNS, MATE_VALUE, Score
 from heckmeckengine.engine.heckmeck_board import HeckmeckBoard
+from heckmeckengine.engine.nnue import Network
+from heckmeckengine.engine.pawn_structure import (
+    KING_SHIELD_WEIGHTS,
+    PAWN_STRUCTURE_WEIGHTS,
+    king_shield_value,
+    pawn_structure_value,
+)
+from heckmeckengine.engine.piece_square_tables import (
+    ENDGAME_TABLES,
+    EVALUATION_SCALE,
+    MATERIAL_VALUES,
+    MAX_PHASE,
+    MIDDLEGAME_TABLES,
+    PHASE_WEIGHTS,
+    PIECE_VALUES,
+    tapered,
+)
 
 
 class EvaluationTarget(Enum):
@@ -13,126 +30,196 @@ class EvaluationTarget(Enum):
     FAST = 2
 
 
-class Evaluation:
-    def __init__(self, board: chess.Board):
-        self.board = board
-
-        self.piece_worth = {
-            chess.KING: 0,
-            chess.PAWN: 1,
-            chess.BISHOP: 3,
-            chess.KNIGHT: 3,
-            chess.ROOK: 5,
-            chess.QUEEN: 9,
-        }
-        self.counter = 0
+# Bit planes of a batch, one per color and piece type in this order
+_PLANES = [
+    (color, piece_type)
+    for color in (chess.WHITE, chess.BLACK)
+    for piece_type in chess.PIECE_TYPES
+]
 
-        self._mate_value = 100000
 
-        self._pawn_map = 0.3 * np.array(
+def _plane_weights() -> np.ndarray:
+    # Weights of the bit planes, so that the evaluation of a batch is a matrix
+    # product. The columns are the material, the middlegame and endgame values
+    # and the game phase.
+    return np.array(
+        [
             [
-                [10.0, 10.0, 10.0, 10.0, 10.0, 10.0, 10.0, 10.0],
-                [3.5, 3.5, 4.0, 4.0, 4.0, 3.5, 3.5, 3.8],
-                [2.5, 2.7, 3.0, 3.5, 3.5, 2.8, 1.5, 2.7],
-                [2.0, 2.3, 2.5, 3.0, 3.0, 2.0, 2.0, 2.2],
-                [1.7, 1.6, 1.8, 2.0, 2.0, 1.2, 1.5, 1.7],
-                [1.3, 1.4, 1.0, 1.0, 1.0, 1.0, 1.4, 1.3],
-                [1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0],
-                [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
+                MATERIAL_VALUES[color][piece_type],
+                MIDDLEGAME_TABLES[color][piece_type][square],
+                ENDGAME_TABLES[color][piece_type][square],
+                PHASE_WEIGHTS[piece_type],
             ]
-        )
+            for color, piece_type in _PLANES
+            for square in chess.SQUARES
+        ],
+        dtype=np.int64,
+    )
 
-        self._knight_map = 0.3 * np.array(
-            [
-                [3.0, 4.0, 5.0, 5.0, 5.0, 5.0, 4.0, 3.0],
-                [5.0, 6.0, 7.0, 7.0, 7.0, 7.0, 6.0, 5.0],
-                [6.0, 7.0, 8.0, 8.0, 8.0, 8.0, 7.0, 6.0],
-                [5.0, 6.0, 7.0, 7.0, 7.0, 7.0, 6.0, 5.0],
-                [4.0, 5.0, 6.0, 6.0, 6.0, 6.0, 5.0, 4.0],
-                [3.0, 4.0, 5.0, 5.0, 5.0, 5.0, 4.0, 3.0],
-                [2.0, 3.0, 4.0, 4.0, 4.0, 4.0, 3.0, 2.0],
-                [1.0, 2.0, 3.0, 3.0, 1.0, 1.0, 1.0, 1.0],
-            ]
-        )
 
-        self._bishop_map = 0.3 * np.array(
-            [
-                [1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0],
-                [1.0, 2.0, 2.0, 2.0, 2.0, 2.0, 2.0, 1.0],
-                [1.0, 3.0, 2.0, 2.0, 2.0, 2.0, 3.0, 1.0],
-                [3.0, 5.0, 4.0, 4.0, 4.0, 4.0, 5.0, 3.0],
-                [1.0, 4.0, 4.0, 3.0, 3.0, 4.0, 4.0, 1.0],
-                [2.0, 4.0, 5.0, 4.0, 4.0, 5.0, 4.0, 2.0],
-                [3.0, 6.0, 4.0, 3.0, 3.0, 4.0, 6.0, 3.0],
-                [4.0, 3.0, 2.0, 1.0, 1.0, 1.0, 1.0, 1.0],
-            ]
-        )
+_WEIGHTS = _plane_weights()
 
-        self._rook_map = 0.3 * np.array(
-            [
-                [5.0, 5.0, 5.0, 5.0, 5.0, 5.0, 5.0, 5.0],
-                [4.0, 4.0, 4.0, 4.0, 4.0, 4.0, 4.0, 4.0],
-                [3.0, 4.0, 5.0, 5.0, 5.0, 5.0, 4.0, 4.0],
-                [1.0, 2.0, 3.0, 3.0, 3.0, 3.0, 2.0, 1.0],
-                [1.0, 2.0, 3.0, 3.0, 3.0, 3.0, 2.0, 1.0],
-                [1.0, 2.0, 3.0, 3.0, 3.0, 3.0, 2.0, 1.0],
-                [6.0, 7.0, 9.0, 9.0, 9.0, 9.0, 7.0, 6.0],
-                [7.0, 8.0, 10.0, 10.0, 10.0, 10.0, 8.0, 7.0],
-            ]
-        )
+_CENTIPAWN = EVALUATION_SCALE // CENTIPAWNS
 
-        self._queen_map = 0.3 * np.array(
-            [
-                [4.0, 5.0, 7.0, 7.0, 7.0, 7.0, 4.0, 5.0],
-                [4.0, 5.0, 7.0, 7.0, 7.0, 7.0, 4.0, 5.0],
-                [6.0, 8.0, 10.0, 10.0, 10.0, 10.0, 8.0, 6.0],
-                [6.0, 7.0, 9.0, 9.0, 9.0, 9.0, 7.0, 6.0],
-                [5.0, 6.0, 8.0, 8.0, 8.0, 8.0, 6.0, 5.0],
-                [2.0, 3.0, 5.0, 6.0, 6.0, 5.0, 3.0, 2.0],
-                [2.0, 2.0, 3.0, 5.0, 5.0, 3.0, 2.0, 2.0],
-                [1.0, 2.0, 3.0, 4.0, 4.0, 5.0, 2.0, 1.0],
-            ]
-        )
+# Default number of entries of the evaluation cache and the pawn hash table
+_CACHE_SIZE = 1 << 16
+_PAWN_HASH_SIZE = 1 << 14
 
-        self._king_map = 0.4 * np.array(
-            [
-                [1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0],
-                [1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0],
-                [1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0],
-                [1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0],
-                [1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0],
-                [1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0],
-                [3.0, 4.0, 1.0, 1.0, 1.0, 1.0, 4.0, 9.0],
-                [4.0, 7.0, 7.0, 5.0, 1.0, 6.0, 10.0, 9.0],
+# Positions unpacked at once, bounds the memory of the bit planes
+_BATCH_CHUNK_SIZE = 1 << 14
+
+
+def board_bitboards(board: chess.BaseBoard) -> list:
+    """The piece bitboards of `board` in the order expected by `evaluate_bitboards`."""
+    return [board.pieces_mask(piece_type, color) for color, piece_type in _PLANES]
+
+
+def evaluate_bitboards(
+    bitboards: np.ndarray,
+    target: "EvaluationTarget",
+    network: Optional[Network] = None,
+    turns: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Evaluations from white's point of view in 1/EVALUATION_SCALE pawns.
+
+    `bitboards` has one row of 12 piece bitboards per position, see
+    `board_bitboards`. A complete evaluation by `network` also needs the side
+    to move of every position. Game outcomes are not taken into account.
+    """
+    bitboards = np.asarray(bitboards, dtype="<u8").reshape(-1, len(_PLANES))
+    use_network = network is not None and target == EvaluationTarget.COMPLETE
+    if use_network:
+        turns = np.asarray(turns, dtype=bool)
+        network_values = np.empty(len(bitboards), dtype=np.int64)
+
+    sums = np.empty((len(bitboards), _WEIGHTS.shape[1]), dtype=np.int64)
+    for start in range(0, len(bitboards), _BATCH_CHUNK_SIZE):
+        chunk = bitboards[start : start + _BATCH_CHUNK_SIZE]
+        planes = np.unpackbits(chunk.view(np.uint8), axis=1, bitorder="little")
+        sums[start : start + len(chunk)] = planes @ _WEIGHTS
+        if use_network:
+            network_values[start : start + len(chunk)] = network.evaluate_planes(
+                planes, turns[start : start + len(chunk)]
+            )
+
+    material, middlegame, endgame, phase = sums.T
+    if target != EvaluationTarget.COMPLETE:
+        return material
+    if use_network:
+        return np.where(turns, network_values, -network_values) * _CENTIPAWN
+
+    white_pawns = bitboards[:, _PLANES.index((chess.WHITE, chess.PAWN))]
+    black_pawns = bitboards[:, _PLANES.index((chess.BLACK, chess.PAWN))]
+    white_king = bitboards[:, _PLANES.index((chess.WHITE, chess.KING))]
+    black_king = bitboards[:, _PLANES.index((chess.BLACK, chess.KING))]
+    return (
+        tapered(middlegame, endgame, np.minimum(phase, MAX_PHASE))
+        + pawn_structure_value(white_pawns, black_pawns)
+        + king_shield_value(white_pawns, black_pawns, white_king, black_king)
+    )
+
+
+def get_weights() -> dict:
+    """The weights of the handcrafted evaluation, as stored by `save_weights`.
+
+    "middlegame" and "endgame" are the values of white's pieces including the
+    material, indexed by piece type minus one and square. Black's tables are
+    their mirror image.
+    """
+    return {
+        "middlegame": np.array(MIDDLEGAME_TABLES[chess.WHITE][1:], dtype=np.int64),
+        "endgame": np.array(ENDGAME_TABLES[chess.WHITE][1:], dtype=np.int64),
+        "pawn_structure": np.array(PAWN_STRUCTURE_WEIGHTS, dtype=np.int64),
+        "king_shield": np.array(KING_SHIELD_WEIGHTS, dtype=np.int64),
+    }
+
+
+def set_weights(weights: dict):
+    """Replace the weights of the handcrafted evaluation, see `get_weights`.
+
+    The tables are changed in place. Boards keep their incremental sums until
+    they are set up again, so set the weights before the positions.
+    """
+    for name, tables in (
+        ("middlegame", MIDDLEGAME_TABLES),
+        ("endgame", ENDGAME_TABLES),
+    ):
+        values = np.asarray(weights[name], dtype=np.int64).reshape(6, 64).tolist()
+        for piece_type in chess.PIECE_TYPES:
+            white = values[piece_type - 1]
+            tables[chess.WHITE][piece_type][:] = white
+            tables[chess.BLACK][piece_type][:] = [
+                -white[chess.square_mirror(square)] for square in chess.SQUARES
             ]
-        )
+    PAWN_STRUCTURE_WEIGHTS[:] = np.asarray(weights["pawn_structure"]).tolist()
+    KING_SHIELD_WEIGHTS[:] = np.asarray(weights["king_shield"]).tolist()
+    _WEIGHTS[:] = _plane_weights()
+
+
+def save_weights(path: str, weights: dict):
+    with open(path, "wb") as file:
+        np.savez(file, **weights)
+
+
+def load_weights(path: str):
+    """Use the weights of a file written by `save_weights`, e.g. by the tuner."""
+    with np.load(path) as weights:
+        set_weights({name: weights[name] for name in get_weights()})
+
+
+_DEFAULT_WEIGHTS = get_weights()
+
+
+def reset_weights():
+    set_weights(_DEFAULT_WEIGHTS)
+
 
-        self._maps_white = {
-            chess.PAWN: self._pawn_map[::-1].flatten(),
-            chess.BISHOP: self._bishop_map[::-1].flatten(),
-            chess.KNIGHT: self._knight_map[::-1].flatten(),
-            chess.ROOK: self._rook_map[::-1].flatten(),
-            chess.QUEEN: self._queen_map[::-1].flatten(),
-            chess.KING: self._king_map[::-1].flatten(),
-        }
-
-        self._maps_black = {
-            chess.PAWN: self._pawn_map.flatten(),
-            chess.BISHOP: self._bishop_map.flatten(),
-            chess.KNIGHT: self._knight_map.flatten(),
-            chess.ROOK: self._rook_map.flatten(),
-            chess.QUEEN: self._queen_map.flatten(),
-            chess.KING: self._king_map.flatten(),
-        }
+class Evaluation:
+    def __init__(
+        self,
+        board: chess.Board,
+        cache_size: int = _CACHE_SIZE,
+        pawn_hash_size: int = _PAWN_HASH_SIZE,
+        network: Optional[Network] = None,
+    ):
+        self.board = board
+
+        # The network replaces the handcrafted complete evaluation
+        self.network = network
+        if network is not None and isinstance(board, HeckmeckBoard):
+            board.set_network(network)
+
+        self.piece_worth = dict(PIECE_VALUES)
+        self.counter = 0
+
+        # Direct-mapped cache of complete evaluations, keyed by the Zobrist key
+        # of a HeckmeckBoard. The size is rounded down to a power of two.
+        cache_size = 1 << (max(cache_size, 1).bit_length() - 1)
+        self._cache_mask = cache_size - 1
+        self._cache_keys = [None] * cache_size
+        self._cache_values = [0] * cache_size
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+        # Pawn structure terms, keyed by the pawn key of a HeckmeckBoard
+        pawn_hash_size = 1 << (max(pawn_hash_size, 1).bit_length() - 1)
+        self._pawn_hash_mask = pawn_hash_size - 1
+        self._pawn_hash_keys = [None] * pawn_hash_size
+        self._pawn_hash_values = [0] * pawn_hash_size
+        self.pawn_hash_hits = 0
+        self.pawn_hash_misses = 0
 
     def get(
         self,
         target: EvaluationTarget,
         maximizer_color: chess.Color,
+        check_outcome: bool = True,
     ) -> Score:
+        # Callers which know that the game goes on can skip `outcome()`, it
+        # generates all legal moves
         self.counter += 1
 
-        outcome = self.board.outcome()
+        outcome = self.board.outcome() if check_outcome else None
         if outcome is not None:  # Game finished
             if outcome.termination == chess.Termination.CHECKMATE:
                 if outcome.winner == chess.WHITE:
@@ -142,57 +229,163 @@ class Evaluation:
             else:
                 return Score(0.0, outcome.termination)
 
-        evaluation = 0
-        piece_evaluation = self._piece_evaluation(self.board)
-        evaluation += piece_evaluation
-
-        if target == EvaluationTarget.COMPLETE:
-            position_evaluation = self._position_evaluation(self.board)
-            evaluation += position_evaluation
-
+        evaluation = self._evaluate(target) / EVALUATION_SCALE
         score = Score(evaluation)
         if maximizer_color == chess.BLACK:
             score = -score
         return score
 
-    def _piece_evaluation(
+    def get_value(
         self,
-        board: HeckmeckBoard,
-        color: Optional[chess.Color] = None,
-    ):
-        if color is None:
-            white_eval = self._piece_evaluation(board, chess.WHITE)
-            black_eval = self._piece_evaluation(board, chess.BLACK)
-            eval = white_eval - black_eval
-            return eval
-        else:
-            eval = 0
-            for piece_type in chess.PIECE_TYPES:
-                piece_count = len(board.pieces(piece_type, color))
-                eval += piece_count * self.piece_worth[piece_type]
-
-            return eval
-
-    def _position_evaluation(
+        target: EvaluationTarget,
+        maximizer_color: chess.Color,
+        check_outcome: bool = True,
+    ) -> int:
+        """Same as `get`, as integer centipawns for the search."""
+        self.counter += 1
+
+        outcome = self.board.outcome() if check_outcome else None
+        if outcome is not None:  # Game finished
+            if outcome.winner is None:
+                return 0
+            return MATE_VALUE if outcome.winner == maximizer_color else -MATE_VALUE
+
+        value = round(self._evaluate(target) * CENTIPAWNS / EVALUATION_SCALE)
+        return value if maximizer_color == chess.WHITE else -value
+
+    def evaluate_batch(
         self,
-        board: HeckmeckBoard,
-        color: Optional[chess.Color] = None,
-    ) -> float:
-        if color is None:
-            white_eval = self._position_evaluation(board, chess.WHITE)
-            black_eval = self._position_evaluation(board, chess.BLACK)
-            eval = white_eval - black_eval
-            return eval
-        else:
-            position_map = (
-                self._maps_white if color == chess.WHITE else self._maps_black
+        boards: Iterable[chess.Board],
+        target: EvaluationTarget,
+        maximizer_color: chess.Color,
+    ) -> np.ndarray:
+        """Values of `get` for many positions at once."""
+        boards = list(boards)
+        self.counter += len(boards)
+
+        bitboards = np.array(
+            [board_bitboards(board) for board in boards], dtype=np.uint64
+        )
+        turns = np.array([board.turn for board in boards], dtype=bool)
+        values = evaluate_bitboards(bitboards, target, self.network, turns)
+        values = values / EVALUATION_SCALE
+        if maximizer_color == chess.BLACK:
+            values = -values
+
+        for index, board in enumerate(boards):
+            outcome = board.outcome()
+            if outcome is None:
+                continue
+            if outcome.termination == chess.Termination.CHECKMATE:
+                values[index] = np.inf if outcome.winner == chess.WHITE else -np.inf
+            else:
+                values[index] = 0.0
+        return values
+
+    def _evaluate(self, target: EvaluationTarget) -> int:
+        # A HeckmeckBoard keeps the sums up to date while moves are made
+        board = self.board
+        if isinstance(board, HeckmeckBoard):
+            if target != EvaluationTarget.COMPLETE:
+                return board.material_balance
+
+            key = board.zobrist_key
+            index = key & self._cache_mask
+            if self._cache_keys[index] == key:
+                self.cache_hits += 1
+                return self._cache_values[index]
+
+            self.cache_misses += 1
+            if self.network is not None:
+                evaluation = self._network_evaluation(board.accumulator)
+            else:
+                evaluation = (
+                    tapered(
+                        board.middlegame_balance,
+                        board.endgame_balance,
+                        min(board.phase, MAX_PHASE),
+                    )
+                    + self._pawn_evaluation(board)
+                    + self._king_shield_evaluation(board)
+                )
+            self._cache_keys[index] = key
+            self._cache_values[index] = evaluation
+            return evaluation
+
+        if target != EvaluationTarget.COMPLETE:
+            return self._piece_evaluation(board)
+        if self.network is not None:
+            return self._network_evaluation(self.network.accumulator(board))
+        return (
+            self._tapered_evaluation(board)
+            + pawn_structure_value(
+                board.pawns & board.occupied_co[chess.WHITE],
+                board.pawns & board.occupied_co[chess.BLACK],
             )
-            eval = 0
-            for piece_type in chess.PIECE_TYPES:
-                positions = board.pieces(piece_type, color)
-                eval += 0.1 * position_map[piece_type][list(positions)].sum()
+            + self._king_shield_evaluation(board)
+        )
+
+    def _network_evaluation(self, accumulator: np.ndarray) -> int:
+        value = self.network.evaluate(accumulator, self.board.turn) * _CENTIPAWN
+        return value if self.board.turn == chess.WHITE else -value
+
+    def _pawn_evaluation(self, board: HeckmeckBoard) -> int:
+        key = board.pawn_key
+        index = key & self._pawn_hash_mask
+        if self._pawn_hash_keys[index] == key:
+            self.pawn_hash_hits += 1
+            return self._pawn_hash_values[index]
+
+        self.pawn_hash_misses += 1
+        evaluation = pawn_structure_value(
+            board.pawns & board.occupied_co[chess.WHITE],
+            board.pawns & board.occupied_co[chess.BLACK],
+        )
+        self._pawn_hash_keys[index] = key
+        self._pawn_hash_values[index] = evaluation
+        return evaluation
+
+    def _king_shield_evaluation(self, board: chess.Board) -> int:
+        white_pawns = board.pawns & board.occupied_co[chess.WHITE]
+        black_pawns = board.pawns & board.occupied_co[chess.BLACK]
+        return king_shield_value(
+            white_pawns,
+            black_pawns,
+            board.kings & board.occupied_co[chess.WHITE],
+            board.kings & board.occupied_co[chess.BLACK],
+        )
+
+    def _piece_evaluation(self, board: chess.Board) -> int:
+        return sum(
+            MATERIAL_VALUES[piece.color][piece.piece_type]
+            for piece in board.piece_map().values()
+        )
+
+    def _tapered_evaluation(self, board: chess.Board) -> int:
+        middlegame = endgame = phase = 0
+        for square, piece in board.piece_map().items():
+            middlegame += MIDDLEGAME_TABLES[piece.color][piece.piece_type][square]
+            endgame += ENDGAME_TABLES[piece.color][piece.piece_type][square]
+            phase += PHASE_WEIGHTS[piece.piece_type]
+        return tapered(middlegame, endgame, min(phase, MAX_PHASE))
+
+    @property
+    def cache_hit_rate(self) -> float:
+        probes = self.cache_hits + self.cache_misses
+        return self.cache_hits / probes if probes else 0.0
+
+    @property
+    def pawn_hash_hit_rate(self) -> float:
+        probes = self.pawn_hash_hits + self.pawn_hash_misses
+        return self.pawn_hash_hits / probes if probes else 0.0
 
-            return eval
+    def clear_cache(self):
+        self._cache_keys = [None] * len(self._cache_keys)
+        self._pawn_hash_keys = [None] * len(self._pawn_hash_keys)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.pawn_hash_hits = 0
+        self.pawn_hash_misses = 0
 
     def reset_counter(self):
         self.counter = 0
@@ -1,7 +1,39 @@
 import chess
+import chess.polyglot
 
-from typing import Iterator, Optional
+from typing import Iterator, Optional, Union
 from heckmeckengine.engine.annotated_move import AnnotatedMove
+from heckmeckengine.engine.nnue import Network
+from heckmeckengine.engine.piece_square_tables import (
+    ENDGAME_TABLES,
+    MATERIAL_VALUES,
+    MIDDLEGAME_TABLES,
+    PHASE_WEIGHTS,
+)
+
+# Polyglot Zobrist keys, so that `HeckmeckBoard.zobrist_key` agrees with
+# `chess.polyglot.zobrist_hash` for standard chess positions.
+_ZOBRIST_ARRAY = chess.polyglot.POLYGLOT_RANDOM_ARRAY
+_ZOBRIST_CASTLING = (
+    (chess.BB_H1, _ZOBRIST_ARRAY[768]),
+    (chess.BB_A1, _ZOBRIST_ARRAY[769]),
+    (chess.BB_H8, _ZOBRIST_ARRAY[770]),
+    (chess.BB_A8, _ZOBRIST_ARRAY[771]),
+)
+_ZOBRIST_EP_FILE = _ZOBRIST_ARRAY[772:780]
+_ZOBRIST_TURN = _ZOBRIST_ARRAY[780]
+
+# History scores are halved once one of them grows beyond this limit, so that
+# recent cutoffs outweigh old ones.
+_HISTORY_LIMIT = 1 << 16
+
+# Piece values of the static exchange evaluation, in centipawns. The king is
+# worth more than everything else so that it is always the last recapture.
+_SEE_VALUES = [0, 100, 300, 300, 500, 900, 20000]
+
+
+def _zobrist_piece(square: chess.Square, piece_type: chess.PieceType, color: chess.Color):
+    return _ZOBRIST_ARRAY[64 * ((piece_type - 1) * 2 + color) + square]
 
 
 class HeckmeckBoard(chess.Board):
@@ -11,8 +43,28 @@ class HeckmeckBoard(chess.Board):
         *,
         chess960: bool = False
     ) -> None:
+        # The incremental state has to exist before the base class starts
+        # placing pieces.
+        self.zobrist_key = 0
+        self._piece_key = 0
+        self.pawn_key = 0
+        self._state_stack = []
+
+        # Evaluation accumulators from white's point of view and the game phase
+        self.material_balance = 0
+        self.middlegame_balance = 0
+        self.endgame_balance = 0
+        self.phase = 0
+
+        # First layer of the network evaluation, only kept if a network is set.
+        # It is replaced instead of changed in place, so that saved states and
+        # copies of the board can share it.
+        self.network: Optional[Network] = None
+        self.accumulator = None
+
         super().__init__(fen, chess960=chess960)
         self.killer_moves = {}
+        self.history_table = [0] * 64 * 64  # Butterfly board, from x to square
 
         self._QUITE_MOVE_PIECE_ORDER = [
             chess.QUEEN,
@@ -39,13 +91,186 @@ class HeckmeckBoard(chess.Board):
             chess.PAWN,
         ]
 
+    def _remove_piece_at(self, square: chess.Square) -> Optional[chess.PieceType]:
+        color = bool(self.occupied_co[chess.WHITE] & chess.BB_SQUARES[square])
+        piece_type = super()._remove_piece_at(square)
+        if piece_type is not None:
+            self._piece_key ^= _zobrist_piece(square, piece_type, color)
+            if piece_type == chess.PAWN:
+                self.pawn_key ^= _zobrist_piece(square, piece_type, color)
+            self.material_balance -= MATERIAL_VALUES[color][piece_type]
+            self.middlegame_balance -= MIDDLEGAME_TABLES[color][piece_type][square]
+            self.endgame_balance -= ENDGAME_TABLES[color][piece_type][square]
+            self.phase -= PHASE_WEIGHTS[piece_type]
+            if self.network is not None:
+                self.accumulator = self.accumulator - self.network.feature_rows(
+                    color, piece_type, square
+                )
+        return piece_type
+
+    def _set_piece_at(
+        self,
+        square: chess.Square,
+        piece_type: chess.PieceType,
+        color: chess.Color,
+        promoted: bool = False,
+    ) -> None:
+        super()._set_piece_at(square, piece_type, color, promoted)
+        self._piece_key ^= _zobrist_piece(square, piece_type, color)
+        if piece_type == chess.PAWN:
+            self.pawn_key ^= _zobrist_piece(square, piece_type, color)
+        self.material_balance += MATERIAL_VALUES[color][piece_type]
+        self.middlegame_balance += MIDDLEGAME_TABLES[color][piece_type][square]
+        self.endgame_balance += ENDGAME_TABLES[color][piece_type][square]
+        self.phase += PHASE_WEIGHTS[piece_type]
+        if self.network is not None:
+            self.accumulator = self.accumulator + self.network.feature_rows(
+                color, piece_type, square
+            )
+
+    def _state_key(self) -> int:
+        key = _ZOBRIST_TURN if self.turn == chess.WHITE else 0
+
+        castling_rights = self.castling_rights
+        if castling_rights:
+            for mask, castling_key in _ZOBRIST_CASTLING:
+                if castling_rights & mask:
+                    key ^= castling_key
+
+        # Like polyglot, the en passant file only counts if a pawn can capture
+        if self.ep_square is not None:
+            if self.turn == chess.WHITE:
+                ep_mask = chess.shift_down(chess.BB_SQUARES[self.ep_square])
+            else:
+                ep_mask = chess.shift_up(chess.BB_SQUARES[self.ep_square])
+            ep_mask = chess.shift_left(ep_mask) | chess.shift_right(ep_mask)
+            if ep_mask & self.pawns & self.occupied_co[self.turn]:
+                key ^= _ZOBRIST_EP_FILE[chess.square_file(self.ep_square)]
+
+        return key
+
+    def _refresh_incremental_state(self) -> None:
+        piece_key = 0
+        pawn_key = 0
+        material_balance = 0
+        middlegame_balance = 0
+        endgame_balance = 0
+        phase = 0
+        for color in chess.COLORS:
+            for square in chess.scan_reversed(self.occupied_co[color]):
+                piece_type = self.piece_type_at(square)
+                piece_key ^= _zobrist_piece(square, piece_type, color)
+                if piece_type == chess.PAWN:
+                    pawn_key ^= _zobrist_piece(square, piece_type, color)
+                material_balance += MATERIAL_VALUES[color][piece_type]
+                middlegame_balance += MIDDLEGAME_TABLES[color][piece_type][square]
+                endgame_balance += ENDGAME_TABLES[color][piece_type][square]
+                phase += PHASE_WEIGHTS[piece_type]
+
+        self._piece_key = piece_key
+        self.pawn_key = pawn_key
+        self.material_balance = material_balance
+        self.middlegame_balance = middlegame_balance
+        self.endgame_balance = endgame_balance
+        self.phase = phase
+        if self.network is not None:
+            self.accumulator = self.network.accumulator(self)
+        self.zobrist_key = piece_key ^ self._state_key()
+
+    def clear_stack(self) -> None:
+        super().clear_stack()
+        self._state_stack = []
+        self._refresh_incremental_state()
+
+    def apply_transform(self, f) -> None:
+        super().apply_transform(f)
+        self._refresh_incremental_state()
+
+    def apply_mirror(self) -> None:
+        super().apply_mirror()
+        self._refresh_incremental_state()
+
+    def push(self, move: chess.Move) -> None:
+        self._state_stack.append(
+            (
+                self.zobrist_key,
+                self._piece_key,
+                self.pawn_key,
+                self.material_balance,
+                self.middlegame_balance,
+                self.endgame_balance,
+                self.phase,
+                self.accumulator,
+            )
+        )
+        super().push(move)
+        self.zobrist_key = self._piece_key ^ self._state_key()
+
+    def pop(self) -> chess.Move:
+        move = super().pop()
+        (
+            self.zobrist_key,
+            self._piece_key,
+            self.pawn_key,
+            self.material_balance,
+            self.middlegame_balance,
+            self.endgame_balance,
+            self.phase,
+            self.accumulator,
+        ) = self._state_stack.pop()
+        return move
+
+    def set_network(self, network: Optional[Network]) -> None:
+        self.network = network
+        self.accumulator = None if network is None else network.accumulator(self)
+
+    def is_draw_by_rule(self) -> bool:
+        """Fifty-move rule, insufficient material or a repeated position.
+
+        Cheaper than `outcome()`, a position counts as repeated as soon as it
+        occurred once before.
+        """
+        if self.halfmove_clock >= 100 and not self.is_check():
+            return True
+
+        # Only minor pieces can be insufficient material
+        if not self.pawns and self.phase <= 2 and self.is_insufficient_material():
+            return True
+
+        key = self.zobrist_key
+        stack = self._state_stack
+        first_index = max(len(stack) - self.halfmove_clock, 0)
+        for index in range(len(stack) - 4, first_index - 1, -2):
+            if stack[index][0] == key:
+                return True
+        return False
+
+    def copy(self, *, stack: Union[bool, int] = True) -> "HeckmeckBoard":
+        board = super().copy(stack=stack)
+        board.zobrist_key = self.zobrist_key
+        board._piece_key = self._piece_key
+        board.pawn_key = self.pawn_key
+        board.material_balance = self.material_balance
+        board.middlegame_balance = self.middlegame_balance
+        board.endgame_balance = self.endgame_balance
+        board.phase = self.phase
+        board.network = self.network
+        board.accumulator = self.accumulator
+        board._state_stack = self._state_stack[
+            len(self._state_stack) - len(board.move_stack) :
+        ]
+        return board
+
     def generate_sorted_legal_moves(
         self,
         from_mask: chess.Bitboard = chess.BB_ALL,
         to_mask: chess.Bitboard = chess.BB_ALL,
         pv_move: AnnotatedMove = chess.Move.null(),
         generate_null_move=False,
+        captures_only=False,
+        skip_losing_captures=False,
     ) -> Iterator[AnnotatedMove]:
+        # Note: When in check, all evasions are generated even if captures_only
         if self.is_variant_end():
             return
 
@@ -64,6 +289,8 @@ class HeckmeckBoard(chess.Board):
                     to_mask,
                     pv_move,
                     generate_null_move,
+                    captures_only,
+                    skip_losing_captures,
                 ):
                     if self._is_safe(king, blockers, move):
                         yield move
@@ -73,6 +300,8 @@ class HeckmeckBoard(chess.Board):
                 to_mask,
                 pv_move,
                 generate_null_move,
+                captures_only,
+                skip_losing_captures,
             )
 
     def generate_sorted_pseudo_legal_moves(
@@ -81,20 +310,22 @@ class HeckmeckBoard(chess.Board):
         to_mask: chess.Bitboard = chess.BB_ALL,
         pv_move: AnnotatedMove = chess.Move.null(),
         generate_null_move=False,
+        captures_only=False,
+        skip_losing_captures=False,
     ) -> Iterator[AnnotatedMove]:
-        # PV move
-        if pv_move:
-            yield pv_move
-            searched_moves = {pv_move}
-        else:
-            searched_moves = set()
-
-        # Null move
+        # Null move, tried before any real move so that it can prune them all
         if generate_null_move:
             move = chess.Move.null()
             move.__class__ = AnnotatedMove
             yield move
 
+        # PV move, which may come from a lossy hash table entry
+        if pv_move and self.is_pseudo_legal(pv_move):
+            yield pv_move
+            searched_moves = {pv_move}
+        else:
+            searched_moves = set()
+
         #
         # Queen promotions which are captures
         pawns = self.pawns & self.occupied_co[self.turn] & from_mask
@@ -137,36 +368,67 @@ class HeckmeckBoard(chess.Board):
         # En passant
         if self.ep_square:
             for move in self.generate_pseudo_legal_ep(from_mask, to_mask):
+                move = AnnotatedMove(move.from_square, move.to_square)
                 if move not in searched_moves:
                     yield move
 
-        # Killer Moves
-
         # Castling
-        if from_mask & self.kings:
+        if not captures_only and from_mask & self.kings:
             for move in self.generate_castling_moves(from_mask, to_mask):
+                move = AnnotatedMove(move.from_square, move.to_square)
                 if move not in searched_moves:
                     yield move
 
-        # Captures
-        for piece_type_attacker in self._LVA[1:]:
-            attacker_squares = (
-                self.pieces_mask(piece_type_attacker, self.turn) & from_mask
+        # Captures, the ones losing material according to the static exchange
+        # evaluation are deferred until after the quiet moves
+        losing_captures = []
+        for piece_type_defender in self._MVV:
+            defender_squares = (
+                self.pieces_mask(piece_type_defender, not self.turn) & to_mask
             )
-            for piece_type_defender in self._MVV:
-                defender_squares = (
-                    self.pieces_mask(piece_type_defender, not self.turn) & to_mask
+            for piece_type_attacker in self._LVA[1:]:
+                attacker_squares = (
+                    self.pieces_mask(piece_type_attacker, self.turn) & from_mask
+                )
+                # Taking a piece of at least the same value never loses
+                maybe_losing = (
+                    _SEE_VALUES[piece_type_attacker] > _SEE_VALUES[piece_type_defender]
                 )
                 for from_square in chess.scan_reversed(attacker_squares):
                     for move in self._generate_move_piece(
                         from_square, to_mask & defender_squares
                     ):
-                        if move not in searched_moves:
+                        if move in searched_moves:
+                            continue
+                        if maybe_losing and self.see(move) < 0:
+                            if not skip_losing_captures:
+                                losing_captures.append(move)
+                        else:
                             yield move
 
+        if captures_only:
+            yield from losing_captures
+            return
+
+        # Killer Moves
+        for move in self.killer_moves.get(self.ply(), ()):
+            if (
+                move is not None
+                and move not in searched_moves
+                and chess.BB_SQUARES[move.from_square] & from_mask
+                and chess.BB_SQUARES[move.to_square] & to_mask
+                and self.is_pseudo_legal(move)
+                and not self.is_capture(move)
+                and not self.is_castling(move)
+            ):
+                searched_moves.add(move)
+                yield move
+
         # Checks
 
-        # Quiet Moves
+        # Quiet Moves, ordered by the history heuristic. Moves with the same
+        # history score keep the piece order.
+        quiet_moves = []
         for piece_type in self._QUITE_MOVE_PIECE_ORDER:
             if piece_type != chess.PAWN:
                 piece_squares = self.pieces_mask(piece_type, self.turn) & from_mask
@@ -175,14 +437,22 @@ class HeckmeckBoard(chess.Board):
                         from_square, to_mask & (~self.occupied)
                     ):
                         if move not in searched_moves:
-                            yield move
+                            quiet_moves.append(move)
             else:
                 for move in self._generate_pawn_advances(
                     from_mask=from_mask,
                     to_mask=to_mask & ~(chess.BB_RANK_1 | chess.BB_RANK_8),
                 ):
                     if move not in searched_moves:
-                        yield move
+                        quiet_moves.append(move)
+
+        history_table = self.history_table
+        quiet_moves.sort(
+            key=lambda move: history_table[move.from_square * 64 + move.to_square],
+            reverse=True,
+        )
+        yield from quiet_moves
+        yield from losing_captures
 
         # Non-queen Promotions
         # Captures
@@ -212,6 +482,56 @@ class HeckmeckBoard(chess.Board):
             if move not in searched_moves:
                 yield move
 
+    def see(self, move: chess.Move) -> int:
+        """Static exchange evaluation of a capture in centipawns.
+
+        Both sides recapture on the target square with their least valuable
+        attacker as long as it pays off. Sliders behind the exchanging pieces
+        join in once their line opens. Pins are ignored.
+        """
+        from_square, to_square = move.from_square, move.to_square
+        occupied = self.occupied & ~chess.BB_SQUARES[from_square]
+        if self.is_en_passant(move):
+            captured_square = to_square + (-8 if self.turn == chess.WHITE else 8)
+            occupied &= ~chess.BB_SQUARES[captured_square]
+            gain = _SEE_VALUES[chess.PAWN]
+        else:
+            gain = _SEE_VALUES[self.piece_type_at(to_square) or 0]
+
+        piece_type = self.piece_type_at(from_square)
+        if move.promotion:
+            gain += _SEE_VALUES[move.promotion] - _SEE_VALUES[chess.PAWN]
+            piece_type = move.promotion
+
+        gains = [gain]
+        color = not self.turn
+        while True:
+            attackers = self.attackers_mask(color, to_square, occupied) & occupied
+            if not attackers:
+                break
+
+            for attacker_type in chess.PIECE_TYPES:
+                attacker_squares = attackers & self.pieces_mask(attacker_type, color)
+                if attacker_squares:
+                    break
+            square = chess.lsb(attacker_squares)
+            occupied &= ~chess.BB_SQUARES[square]
+
+            # The king may only recapture if the square is not defended anymore
+            if attacker_type == chess.KING and (
+                self.attackers_mask(not color, to_square, occupied) & occupied
+            ):
+                break
+
+            gains.append(_SEE_VALUES[piece_type] - gains[-1])
+            piece_type = attacker_type
+            color = not color
+
+        # Either side may stop capturing when it would lose by going on
+        for index in range(len(gains) - 1, 0, -1):
+            gains[index - 1] = -max(-gains[index - 1], gains[index])
+        return gains[0]
+
     def _generate_promotions_without_capture(
         self,
         from_mask,
@@ -281,12 +601,27 @@ class HeckmeckBoard(chess.Board):
             yield AnnotatedMove(from_square, to_square)
 
     def add_killer_move(self, move: AnnotatedMove):
-        ply = self.board.ply()
+        ply = self.ply()
         if ply not in self.killer_moves:
             self.killer_moves[ply] = (None, None)
 
-        new_killer_moves = (move, self.killer_moves[ply][0])
-        self.killer_moves[ply] = new_killer_moves
+        if move != self.killer_moves[ply][0]:
+            new_killer_moves = (move, self.killer_moves[ply][0])
+            self.killer_moves[ply] = new_killer_moves
+
+    def add_history(self, move: AnnotatedMove, depth: int):
+        index = move.from_square * 64 + move.to_square
+        self.history_table[index] += depth * depth
+
+        if self.history_table[index] > _HISTORY_LIMIT:
+            self.age_history()
+
+    def age_history(self):
+        self.history_table = [score // 2 for score in self.history_table]
+
+    def clear_move_ordering(self):
+        self.killer_moves = {}
+        self.history_table = [0] * 64 * 64
 
 
 if __name__ == "__main__":
@@ -1,16 +1,66 @@
 import chess
 import logging
+from typing import Optional
 
 from heckmeckengine.engine.annotated_move import AnnotatedMove
 from heckmeckengine.engine.engine import Engine
 from heckmeckengine.engine.search_tree import SearchTree
-from heckmeckengine.engine.evaluation import Evaluation, EvaluationTarget
+from heckmeckengine.engine.evaluation import (
+    Evaluation,
+    EvaluationTarget,
+    load_weights,
+    reset_weights,
+)
 from heckmeckengine.engine.heckmeck_board import HeckmeckBoard
+from heckmeckengine.engine.transposition_table import TranspositionTable
+from heckmeckengine.engine.search_mode import SearchMode
+from heckmeckengine.engine.lazy_smp import LazySMP
+from heckmeckengine.engine.root_split import RootSplitPool
+from heckmeckengine.engine.parallel_mode import ParallelMode
+from heckmeckengine.engine.search_limits import SearchLimits
+from heckmeckengine.engine.nnue import Network
+from heckmeckengine.engine.score import MATE_BOUND
 
 LOGGER = logging.getLogger("heckmeck_engine")
 
+# Depth limit of searches that are bounded by time or nodes instead
+_MAX_SEARCH_DEPTH = 64
+
+# First iteration of a search whose position was not anticipated
+_START_DEPTH = 2
+
 
 class HeckmeckEngine(Engine):
+    def __init__(
+        self,
+        hash_size_mb: int = 16,
+        search_mode: SearchMode = SearchMode.ALPHA_BETA,
+        null_move_reduction: Optional[int] = 2,
+        threads: int = 1,
+        parallel_mode: ParallelMode = ParallelMode.LAZY_SMP,
+        max_depth: int = 5,
+        eval_file: Optional[str] = None,
+        weights_file: Optional[str] = None,
+    ):
+        super().__init__()
+        self.hash_size_mb = hash_size_mb
+        self.search_mode = search_mode
+        self.null_move_reduction = null_move_reduction
+        self.threads = threads
+        self.parallel_mode = parallel_mode
+        self.max_depth = max_depth
+        self.eval_file = eval_file
+        self.network = None if eval_file is None else Network(eval_file)
+        self.weights_file = weights_file
+        if weights_file is not None:
+            load_weights(weights_file)
+        self.ponder_move = None
+        self._expected_line = None
+        self.last_search: Optional[SearchTree] = None
+        self.transposition_table = None
+        self.lazy_smp = None
+        self.root_split_pool = None
+
     @property
     def name(self):
         return "Heckmeck Engine"
@@ -19,27 +69,199 @@ class HeckmeckEngine(Engine):
     def author(self):
         return "Max Mihailescu"
 
-    def play(self, iteration_callback=None) -> chess.Move:
+    def play(
+        self,
+        iteration_callback=None,
+        limits: Optional[SearchLimits] = None,
+        stop_event=None,
+        ponderhit_event=None,
+        info_callback=None,
+    ) -> chess.Move:
         self.game_started = True
         color = self.board.turn
 
-        self.evaluation.reset_counter()
-        tree = SearchTree(
-            max_depth=5,
-            color=color,
-            board=self.board,
-            evaluation=self.evaluation,
+        if limits is None:
+            limits = SearchLimits()
+        max_depth = limits.depth
+        if max_depth is None:
+            max_depth = (
+                _MAX_SEARCH_DEPTH
+                if limits.is_bounded or limits.infinite or limits.ponder
+                else self.max_depth
+            )
+        soft_time_limit, hard_time_limit = limits.time_limits(color)
+        search_limits = dict(
+            stop_event=stop_event,
+            soft_time_limit=soft_time_limit,
+            hard_time_limit=hard_time_limit,
+            node_limit=limits.nodes,
+            ponderhit_event=ponderhit_event if limits.ponder else None,
+            info_callback=info_callback,
         )
+
+        # Continue the previous search if the opponent played the expected move
+        start_depth = _START_DEPTH
+        search_options = dict(
+            search_mode=self.search_mode,
+            null_move_reduction=self.null_move_reduction,
+        )
+        if (
+            self._expected_line is not None
+            and self._expected_line[0] == self.board.zobrist_key
+        ):
+            _, principal_variation, value, depth = self._expected_line
+            start_depth = min(max(start_depth, depth + 1), max_depth)
+            search_options.update(principal_variation=principal_variation, value=value)
+            LOGGER.debug(f"Expected position, starting at depth {start_depth}")
+        self._expected_line = None
+
+        self.evaluation.reset_counter()
+        if self.lazy_smp is not None:
+            tree = self.lazy_smp.search(
+                self.board,
+                self.evaluation,
+                max_depth=max_depth,
+                start_depth=start_depth,
+                iteration_callback=iteration_callback,
+                search_limits=search_limits,
+                **search_options,
+            )
+        else:
+            self.transposition_table.new_search()
+            tree = SearchTree(
+                max_depth=max_depth,
+                start_depth=start_depth,
+                color=color,
+                board=self.board,
+                evaluation=self.evaluation,
+                transposition_table=self.transposition_table,
+                root_split_pool=self.root_split_pool,
+                **search_limits,
+                **search_options,
+            )
+            tree.traverse_tree(iteration_callback)
         self.num_evaluations = 0
 
-        result = tree.traverse_tree(iteration_callback)
+        if tree.principal_variation:
+            result = tree.principal_variation[0]
+        else:  # Stopped before any root move was searched
+            result = next(self.board.generate_sorted_legal_moves(), None)
+
+        # Expected reply, searched while the opponent thinks
+        self.ponder_move = None
+        self.last_search = tree
+        if result is None:  # Checkmate or stalemate, reported as bestmove 0000
+            return chess.Move.null()
+        if len(tree.principal_variation) > 1:
+            self.ponder_move = tree.principal_variation[1]
         LOGGER.debug(f"Number of evaluations: {self.evaluation.counter}")
+        LOGGER.debug(f"Evaluation cache hit rate: {self.evaluation.cache_hit_rate}")
+        LOGGER.debug(f"Pawn hash hit rate: {self.evaluation.pawn_hash_hit_rate}")
         self.board.push(result)
+        self._remember_expected_line(tree)
         return result
 
+    def _remember_expected_line(self, tree: SearchTree):
+        # The search of the position after the expected reply is resolved
+        # two plies less deep than the root
+        principal_variation = tree.principal_variation
+        if len(principal_variation) < 3 or tree.completed_depth < 3:
+            return
+
+        self.board.push(principal_variation[1])
+        key = self.board.zobrist_key
+        self.board.pop()
+
+        # Mate scores count the plies from the root, two of which are played
+        value = tree.value
+        if value >= MATE_BOUND:
+            value += 2
+        elif value <= -MATE_BOUND:
+            value -= 2
+        self._expected_line = (
+            key,
+            principal_variation[2:],
+            value,
+            tree.completed_depth - 2,
+        )
+
     def ucinewgame(self):
         super().ucinewgame()
 
         self.board = HeckmeckBoard()
-        self.evaluation = Evaluation(self.board)
+        self.evaluation = Evaluation(self.board, network=self.network)
+        self._expected_line = None
+        if self.transposition_table is None:
+            self._create_search_workers()
+        else:
+            self.transposition_table.clear()
         self.num_evaluations = 0
+
+    def set_option(self, name: str, value: str):
+        if name == "Hash":
+            self.hash_size_mb = int(value)
+            self._create_search_workers()
+        elif name == "SearchMode":
+            self.search_mode = SearchMode(value)
+        elif name == "Ponder":
+            pass  # The GUI decides when to ponder
+        elif name == "Threads":
+            self.threads = int(value)
+            self._create_search_workers()
+        elif name == "ParallelMode":
+            self.parallel_mode = ParallelMode(value)
+            self._create_search_workers()
+        elif name == "EvalFile":
+            # An empty value switches back to the handcrafted evaluation
+            self.eval_file = None if value in (None, "", "<empty>") else value
+            self.network = None if self.eval_file is None else Network(self.eval_file)
+            if self.board is not None:
+                # Also detaches a cleared network, the board would keep
+                # updating its accumulator otherwise
+                self.board.set_network(self.network)
+                self.evaluation = Evaluation(self.board, network=self.network)
+            self._create_search_workers()
+        elif name == "WeightsFile":
+            # Tuned weights of the handcrafted evaluation, see scripts/tune.py
+            self.weights_file = None if value in (None, "", "<empty>") else value
+            if self.weights_file is None:
+                reset_weights()
+            else:
+                load_weights(self.weights_file)
+            # The board picks up the weights with the next position
+            if self.board is not None:
+                self.evaluation = Evaluation(self.board, network=self.network)
+            self._create_search_workers()
+        else:
+            super().set_option(name, value)
+
+    def close(self):
+        if self.lazy_smp is not None:
+            self.lazy_smp.close()
+            self.lazy_smp = None
+        if self.root_split_pool is not None:
+            self.root_split_pool.close()
+            self.root_split_pool = None
+
+    def _create_search_workers(self):
+        # Lazy SMP shares the table with its helpers, the root split workers
+        # have their own tables
+        self.close()
+        if self.threads > 1 and self.parallel_mode == ParallelMode.LAZY_SMP:
+            self.lazy_smp = LazySMP(
+                self.threads - 1,
+                self.hash_size_mb,
+                eval_file=self.eval_file,
+                weights_file=self.weights_file,
+            )
+            self.transposition_table = self.lazy_smp.transposition_table
+            return
+
+        if self.threads > 1:
+            self.root_split_pool = RootSplitPool(
+                self.threads,
+                self.hash_size_mb,
+                eval_file=self.eval_file,
+                weights_file=self.weights_file,
+            )
+        self.transposition_table = TranspositionTable(size_mb=self.hash_size_mb)
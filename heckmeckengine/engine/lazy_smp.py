@@ -0,0 +1,213 @@
+import logging
+import multiprocessing
+import queue
+from typing import Optional
+
+from heckmeckengine.engine.evaluation import Evaluation, load_weights
+from heckmeckengine.engine.heckmeck_board import HeckmeckBoard
+from heckmeckengine.engine.nnue import Network
+from heckmeckengine.engine.search_tree import SearchTree
+from heckmeckengine.engine.transposition_table import TranspositionTable
+
+LOGGER = logging.getLogger("lazy_smp")
+
+# Interval in seconds to check for dead helpers while waiting for results
+_RESULT_POLL_INTERVAL = 0.5
+
+
+def _run_helper(
+    index: int,
+    table_name: str,
+    table_size_mb: float,
+    jobs: multiprocessing.Queue,
+    results: multiprocessing.Queue,
+    stop_event,
+    eval_file: Optional[str],
+    weights_file: Optional[str],
+):
+    if weights_file is not None:
+        load_weights(weights_file)
+    transposition_table = TranspositionTable.attach(table_name, table_size_mb)
+    board = HeckmeckBoard()
+    network = None if eval_file is None else Network(eval_file)
+    evaluation = Evaluation(board, network=network)
+
+    parent = multiprocessing.parent_process()
+    while True:
+        try:
+            job = jobs.get(timeout=1.0)
+        except queue.Empty:
+            if parent.is_alive():
+                continue
+            break  # The main process was killed without closing the pool
+        if job is None:
+            break
+
+        search_id, fen, moves, age, max_depth, start_depth, search_options = job
+        board.set_fen(fen)
+        for move in moves:
+            board.push_uci(move)
+        transposition_table.age = age
+
+        tree = SearchTree(
+            board=board,
+            color=board.turn,
+            evaluation=evaluation,
+            max_depth=max_depth,
+            start_depth=start_depth,
+            transposition_table=transposition_table,
+            stop_event=stop_event,
+            **search_options,
+        )
+        tree.traverse_tree()
+        results.put(
+            (
+                index,
+                search_id,
+                tree.statistics.nodes + tree.statistics.quiescence_nodes,
+            )
+        )
+
+    transposition_table.close()
+
+
+class LazySMP:
+    """Searches the same root in several processes sharing one hash table.
+
+    The main process runs the search whose result is played. The helpers start
+    at alternating depths and search one ply deeper, so they run ahead and fill
+    the shared transposition table with results and moves the main search can
+    use. They are stopped as soon as the main search finishes. A helper that
+    died is skipped and restarted for the next search.
+    """
+
+    def __init__(
+        self,
+        num_helpers: int,
+        hash_size_mb: float = 16,
+        eval_file: Optional[str] = None,
+        weights_file: Optional[str] = None,
+    ):
+        self.transposition_table = TranspositionTable(hash_size_mb, shared=True)
+        self.helper_nodes = 0
+
+        self._eval_file = eval_file
+        self._weights_file = weights_file
+        self._stop_event = multiprocessing.Event()
+        self._results = multiprocessing.Queue()
+        self._search_id = 0
+        self._jobs = [None] * num_helpers
+        self._helpers = [None] * num_helpers
+        for index in range(num_helpers):
+            self._start_helper(index)
+
+    def _start_helper(self, index: int):
+        # A fresh queue, a killed helper may have left the old one locked
+        jobs = multiprocessing.Queue()
+        helper = multiprocessing.Process(
+            target=_run_helper,
+            args=(
+                index,
+                self.transposition_table.name,
+                self.transposition_table.size_mb,
+                jobs,
+                self._results,
+                self._stop_event,
+                self._eval_file,
+                self._weights_file,
+            ),
+            daemon=True,
+        )
+        helper.start()
+        self._jobs[index] = jobs
+        self._helpers[index] = helper
+
+    @property
+    def num_helpers(self) -> int:
+        return len(self._helpers)
+
+    def search(
+        self,
+        board: HeckmeckBoard,
+        evaluation: Evaluation,
+        max_depth: int,
+        start_depth: int = 2,
+        iteration_callback=None,
+        search_limits: Optional[dict] = None,
+        **search_options,
+    ) -> SearchTree:
+        """Search `board` with all processes and return the main search tree.
+
+        `search_limits` are passed to the main search only, the helpers are
+        stopped together with it. This includes the `info_callback`.
+        """
+        self.transposition_table.new_search()
+        self._stop_event.clear()
+        for index, helper in enumerate(self._helpers):
+            if not helper.is_alive():
+                LOGGER.warning(f"Helper {index} died, restarting it")
+                self._start_helper(index)
+
+        # Results of helpers that were given up on are told apart by the id
+        self._search_id += 1
+        fen = board.root().fen()
+        moves = [move.uci() for move in board.move_stack]
+        for index, jobs in enumerate(self._jobs):
+            jobs.put(
+                (
+                    self._search_id,
+                    fen,
+                    moves,
+                    self.transposition_table.age,
+                    max_depth + 1,
+                    start_depth + index % 2,
+                    search_options,
+                )
+            )
+
+        try:
+            tree = SearchTree(
+                board=board,
+                color=board.turn,
+                evaluation=evaluation,
+                max_depth=max_depth,
+                start_depth=start_depth,
+                transposition_table=self.transposition_table,
+                **(search_limits or {}),
+                **search_options,
+            )
+            tree.traverse_tree(iteration_callback)
+        finally:
+            self._stop_event.set()
+            self._collect_results()
+        LOGGER.debug(f"Helper nodes: {self.helper_nodes}")
+        return tree
+
+    def _collect_results(self):
+        self.helper_nodes = 0
+        pending = set(range(len(self._helpers)))
+        while pending:
+            try:
+                index, search_id, nodes = self._results.get(
+                    timeout=_RESULT_POLL_INTERVAL
+                )
+            except queue.Empty:
+                # A dead helper never reports, it is restarted by the next search
+                for index in list(pending):
+                    if not self._helpers[index].is_alive():
+                        LOGGER.warning(f"Helper {index} died during the search")
+                        pending.remove(index)
+                continue
+
+            if search_id == self._search_id:
+                pending.discard(index)
+                self.helper_nodes += nodes
+
+    def close(self):
+        for jobs in self._jobs:
+            jobs.put(None)
+        for helper in self._helpers:
+            helper.join()
+        self._jobs = []
+        self._helpers = []
+        self.transposition_table.close()
@@ -0,0 +1,160 @@
+import chess
+import numpy as np
+
+from heckmeckengine.engine.score import CENTIPAWNS
+
+# File layout: a header of four little-endian uint32 (magic, version, size of
+# the accumulator, size of the hidden layer), then the arrays of `_LAYOUT` in
+# this order. The 32-bit arrays come first so that every array is aligned.
+_MAGIC = 0x4E4E4D48  # "HMNN"
+_VERSION = 1
+_HEADER_SIZE = 16
+_LAYOUT = [
+    ("l1_bias", "<i4"),
+    ("output_bias", "<i4"),
+    ("feature_weights", "<i2"),
+    ("feature_bias", "<i2"),
+    ("l1_weights", "i1"),
+    ("output_weights", "i1"),
+]
+
+# One input per color, piece type and square, seen from one side
+NUM_FEATURES = 768
+
+# Activations are clipped to [0, ACTIVATION_SCALE], which stands for 1.0. The
+# int8 weights of the dense layers are scaled by WEIGHT_SCALE.
+ACTIVATION_SCALE = 127
+WEIGHT_SCALE = 64
+
+
+def _feature(perspective: chess.Color, color: chess.Color, piece_type, square) -> int:
+    # Pieces of the perspective come first, black sees the board mirrored
+    if perspective == chess.BLACK:
+        square = chess.square_mirror(square)
+    return (0 if color == perspective else 384) + (piece_type - 1) * 64 + square
+
+
+# Rows of the feature weights for both accumulators, indexed by color, piece
+# type and square. The accumulator of a perspective is at index `int(color)`.
+_FEATURE_ROWS = [
+    [None]
+    + [
+        [
+            [
+                _feature(chess.BLACK, color, piece_type, square),
+                _feature(chess.WHITE, color, piece_type, square),
+            ]
+            for square in chess.SQUARES
+        ]
+        for piece_type in chess.PIECE_TYPES
+    ]
+    for color in (chess.BLACK, chess.WHITE)
+]
+
+
+def _shapes(accumulator_size: int, hidden_size: int) -> dict:
+    return {
+        "l1_bias": (hidden_size,),
+        "output_bias": (1,),
+        "feature_weights": (NUM_FEATURES, accumulator_size),
+        "feature_bias": (accumulator_size,),
+        "l1_weights": (2 * accumulator_size, hidden_size),
+        "output_weights": (hidden_size,),
+    }
+
+
+def save_network(path: str, **arrays: np.ndarray):
+    """Write the quantized arrays of a network, see `_LAYOUT`."""
+    accumulator_size = arrays["feature_bias"].shape[0]
+    hidden_size = arrays["l1_bias"].shape[0]
+    shapes = _shapes(accumulator_size, hidden_size)
+    with open(path, "wb") as file:
+        header = [_MAGIC, _VERSION, accumulator_size, hidden_size]
+        file.write(np.array(header, dtype="<u4").tobytes())
+        for name, dtype in _LAYOUT:
+            array = np.asarray(arrays[name]).astype(dtype, casting="same_kind")
+            if array.shape != shapes[name]:
+                raise ValueError(f"{name} has shape {array.shape}, not {shapes[name]}")
+            file.write(array.tobytes())
+
+
+class Network:
+    """Small quantized network over piece-square features.
+
+    The first layer is kept as one int16 accumulator per side, which
+    `HeckmeckBoard` updates with the rows of the moved pieces. Evaluating a
+    position then only runs the small dense layers. The weights stay memory
+    mapped, so all processes of a search share one copy.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        data = np.memmap(path, dtype=np.uint8, mode="r")
+        magic, version, accumulator_size, hidden_size = (
+            data[:_HEADER_SIZE].view("<u4").tolist()
+        )
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"{path} is not a network file")
+
+        shapes = _shapes(accumulator_size, hidden_size)
+        offset = _HEADER_SIZE
+        for name, dtype in _LAYOUT:
+            dtype = np.dtype(dtype)
+            size = dtype.itemsize * int(np.prod(shapes[name]))
+            array = np.asarray(data[offset : offset + size]).view(dtype)
+            setattr(self, name, array.reshape(shapes[name]))
+            offset += size
+        if offset != len(data):
+            raise ValueError(f"{path} does not match its header")
+
+        self.accumulator_size = accumulator_size
+        self.hidden_size = hidden_size
+        self._output_bias = int(self.output_bias[0])
+
+        # Permutation of the features from white's to black's point of view
+        self._black_features = np.array(
+            [
+                _feature(chess.BLACK, color, piece_type, square)
+                for color in (chess.WHITE, chess.BLACK)
+                for piece_type in chess.PIECE_TYPES
+                for square in chess.SQUARES
+            ]
+        ).argsort()
+
+    def feature_rows(self, color: chess.Color, piece_type, square) -> np.ndarray:
+        """Change of both accumulators by a piece, see `accumulator`."""
+        return self.feature_weights[_FEATURE_ROWS[color][piece_type][square]]
+
+    def accumulator(self, board: chess.BaseBoard) -> np.ndarray:
+        """Accumulators of both sides, the one of `color` at index `int(color)`."""
+        accumulator = np.tile(self.feature_bias, (2, 1))
+        for square, piece in board.piece_map().items():
+            accumulator += self.feature_rows(piece.color, piece.piece_type, square)
+        return accumulator
+
+    def evaluate(self, accumulator: np.ndarray, turn: chess.Color) -> int:
+        """Centipawns from the point of view of the side to move."""
+        hidden = np.concatenate((accumulator[int(turn)], accumulator[int(not turn)]))
+        hidden = np.clip(hidden, 0, ACTIVATION_SCALE).astype(np.int32)
+        hidden = (hidden @ self.l1_weights + self.l1_bias) // WEIGHT_SCALE
+        hidden = np.clip(hidden, 0, ACTIVATION_SCALE)
+        output = int(hidden @ self.output_weights) + self._output_bias
+        return output * CENTIPAWNS // (ACTIVATION_SCALE * WEIGHT_SCALE)
+
+    def evaluate_planes(self, planes: np.ndarray, turns: np.ndarray) -> np.ndarray:
+        """`evaluate` for rows of 768 piece-square bits, white's pieces first."""
+        # Summed up in int64, the cast wraps around like the int16 updates
+        feature_weights = self.feature_weights.astype(np.int64)
+        white = (planes @ feature_weights + self.feature_bias).astype(np.int16)
+        black = planes[:, self._black_features] @ feature_weights
+        black = (black + self.feature_bias).astype(np.int16)
+
+        turns = np.asarray(turns, dtype=bool)[:, np.newaxis]
+        hidden = np.concatenate(
+            (np.where(turns, white, black), np.where(turns, black, white)), axis=1
+        )
+        hidden = np.clip(hidden, 0, ACTIVATION_SCALE).astype(np.int32)
+        hidden = (hidden @ self.l1_weights + self.l1_bias) // WEIGHT_SCALE
+        hidden = np.clip(hidden, 0, ACTIVATION_SCALE).astype(np.int64)
+        output = hidden @ self.output_weights.astype(np.int64) + self._output_bias
+        return output * CENTIPAWNS // (ACTIVATION_SCALE * WEIGHT_SCALE)
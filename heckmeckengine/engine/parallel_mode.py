@@ -0,0 +1,6 @@
+from enum import Enum
+
+
+class ParallelMode(Enum):
+    LAZY_SMP = "LazySMP"
+    ROOT_SPLIT = "RootSplit"
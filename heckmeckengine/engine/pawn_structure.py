@@ -0,0 +1,187 @@
+import chess
+import numpy as np
+from operator import mul, sub
+
+from heckmeckengine.engine.piece_square_tables import EVALUATION_SCALE
+
+# The terms are computed with shifts and masks only, so that the same code
+# works on single bitboards and on NumPy arrays of bitboards.
+
+_CENTIPAWN = EVALUATION_SCALE // 100
+
+# Weights of the terms of `pawn_structure_terms`: doubled, isolated and
+# backward pawns, then passed pawns by their rank as seen from their own side
+PAWN_STRUCTURE_WEIGHTS = [
+    -10 * _CENTIPAWN,
+    -10 * _CENTIPAWN,
+    -8 * _CENTIPAWN,
+    5 * _CENTIPAWN,
+    10 * _CENTIPAWN,
+    20 * _CENTIPAWN,
+    35 * _CENTIPAWN,
+    60 * _CENTIPAWN,
+    100 * _CENTIPAWN,
+]
+
+# Weights of the terms of `king_shield_terms`: pawns right in front of a
+# castled king and one rank further
+KING_SHIELD_WEIGHTS = [10 * _CENTIPAWN, 5 * _CENTIPAWN]
+
+# Ranks on which a pawn can be passed, as seen from white and from black
+_WHITE_PASSED_RANKS = [chess.BB_RANKS[rank] for rank in range(1, 7)]
+_BLACK_PASSED_RANKS = [chess.BB_RANKS[7 - rank] for rank in range(1, 7)]
+
+_NOT_FILE_A = chess.BB_ALL ^ chess.BB_FILE_A
+_NOT_FILE_H = chess.BB_ALL ^ chess.BB_FILE_H
+
+
+def _north(bitboard):
+    return bitboard << 8 & chess.BB_ALL
+
+
+def _south(bitboard):
+    return bitboard >> 8
+
+
+def _east(bitboard):
+    return bitboard << 1 & _NOT_FILE_A
+
+
+def _west(bitboard):
+    return bitboard >> 1 & _NOT_FILE_H
+
+
+# No in-place operators, they would modify the arrays of the caller
+
+
+def _north_fill(bitboard):
+    bitboard = bitboard | bitboard << 8 & chess.BB_ALL
+    bitboard = bitboard | bitboard << 16 & chess.BB_ALL
+    return bitboard | bitboard << 32 & chess.BB_ALL
+
+
+def _south_fill(bitboard):
+    bitboard = bitboard | bitboard >> 8
+    bitboard = bitboard | bitboard >> 16
+    return bitboard | bitboard >> 32
+
+
+_M1 = np.uint64(0x5555555555555555)
+_M2 = np.uint64(0x3333333333333333)
+_M4 = np.uint64(0x0F0F0F0F0F0F0F0F)
+_H01 = np.uint64(0x0101010101010101)
+
+
+def popcount(bitboard):
+    """Number of set bits of a bitboard or of each bitboard of an array."""
+    if isinstance(bitboard, int):
+        return bitboard.bit_count()
+
+    # np.bitwise_count needs NumPy 2, this sums the bits of each byte instead
+    bitboard = np.asarray(bitboard, dtype=np.uint64)
+    bitboard = bitboard - (bitboard >> np.uint64(1) & _M1)
+    bitboard = (bitboard & _M2) + (bitboard >> np.uint64(2) & _M2)
+    bitboard = bitboard + (bitboard >> np.uint64(4)) & _M4
+    return (bitboard * _H01 >> np.uint64(56)).astype(np.int64)
+
+
+def _side_terms(
+    pawns, enemy_pawns, forward, backward, forward_fill, backward_fill, ranks
+):
+    files = forward_fill(pawns) | backward_fill(pawns)
+    adjacent_files = _east(files) | _west(files)
+
+    doubled = pawns & forward_fill(forward(pawns))
+    isolated = pawns & (adjacent_files ^ chess.BB_ALL)
+
+    # A pawn is backward if an enemy pawn attacks its stop square and no pawn
+    # of its own can ever defend it
+    attack_span = forward_fill(_east(forward(pawns)) | _west(forward(pawns)))
+    enemy_attacks = _east(backward(enemy_pawns)) | _west(backward(enemy_pawns))
+    stop_squares = forward(pawns & (isolated ^ chess.BB_ALL))
+    backward_pawns = stop_squares & enemy_attacks & (attack_span ^ chess.BB_ALL)
+
+    enemy_front_span = backward_fill(backward(enemy_pawns))
+    enemy_front_span = (
+        enemy_front_span | _east(enemy_front_span) | _west(enemy_front_span)
+    )
+    passed = pawns & (enemy_front_span ^ chess.BB_ALL)
+
+    return [popcount(doubled), popcount(isolated), popcount(backward_pawns)] + [
+        popcount(passed & rank) for rank in ranks
+    ]
+
+
+def _shield_terms(pawns, king, forward, home_ranks):
+    # Only a king which stays on its first two ranks is sheltered
+    king = king & home_ranks
+    near_shield = forward(king | _east(king) | _west(king))
+    far_shield = forward(near_shield)
+    return [popcount(pawns & near_shield), popcount(pawns & far_shield)]
+
+
+def _weighted_sum(weights, terms):
+    return sum(map(mul, weights, terms))
+
+
+def _pawn_structure_sides(white_pawns, black_pawns):
+    white = _side_terms(
+        white_pawns,
+        black_pawns,
+        _north,
+        _south,
+        _north_fill,
+        _south_fill,
+        _WHITE_PASSED_RANKS,
+    )
+    black = _side_terms(
+        black_pawns,
+        white_pawns,
+        _south,
+        _north,
+        _south_fill,
+        _north_fill,
+        _BLACK_PASSED_RANKS,
+    )
+    return white, black
+
+
+def _king_shield_sides(white_pawns, black_pawns, white_king, black_king):
+    white = _shield_terms(
+        white_pawns, white_king, _north, chess.BB_RANK_1 | chess.BB_RANK_2
+    )
+    black = _shield_terms(
+        black_pawns, black_king, _south, chess.BB_RANK_7 | chess.BB_RANK_8
+    )
+    return white, black
+
+
+def pawn_structure_terms(white_pawns, black_pawns) -> list:
+    """Differences of the pawn structure terms of white and black.
+
+    The terms are doubled, isolated and backward pawns and passed pawns by
+    rank, see PAWN_STRUCTURE_WEIGHTS.
+    """
+    white, black = _pawn_structure_sides(white_pawns, black_pawns)
+    return list(map(sub, white, black))
+
+
+def king_shield_terms(white_pawns, black_pawns, white_king, black_king) -> list:
+    """Differences of the shield pawns of white and black, see KING_SHIELD_WEIGHTS."""
+    white, black = _king_shield_sides(white_pawns, black_pawns, white_king, black_king)
+    return list(map(sub, white, black))
+
+
+def pawn_structure_value(white_pawns, black_pawns):
+    """Doubled, isolated, backward and passed pawns from white's point of view."""
+    white, black = _pawn_structure_sides(white_pawns, black_pawns)
+    return _weighted_sum(PAWN_STRUCTURE_WEIGHTS, white) - _weighted_sum(
+        PAWN_STRUCTURE_WEIGHTS, black
+    )
+
+
+def king_shield_value(white_pawns, black_pawns, white_king, black_king):
+    """Pawns in front of the kings from white's point of view."""
+    white, black = _king_shield_sides(white_pawns, black_pawns, white_king, black_king)
+    near_weight, far_weight = KING_SHIELD_WEIGHTS
+    return near_weight * (white[0] - black[0]) + far_weight * (white[1] - black[1])
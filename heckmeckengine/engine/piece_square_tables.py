@@ -0,0 +1,169 @@
+import chess
+
+# Evaluation terms are integers in units of 1/EVALUATION_SCALE pawns, so that
+# they can be summed up incrementally without rounding errors
+EVALUATION_SCALE = 10000
+
+PIECE_VALUES = {
+    chess.KING: 0,
+    chess.PAWN: 1,
+    chess.BISHOP: 3,
+    chess.KNIGHT: 3,
+    chess.ROOK: 5,
+    chess.QUEEN: 9,
+}
+
+# Positional bonuses in tenths of a pawn times the weight of the map. The rows
+# go from rank 8 down to rank 1 as seen by white.
+_PAWN_MAP = 0.3, [
+    [10.0, 10.0, 10.0, 10.0, 10.0, 10.0, 10.0, 10.0],
+    [3.5, 3.5, 4.0, 4.0, 4.0, 3.5, 3.5, 3.8],
+    [2.5, 2.7, 3.0, 3.5, 3.5, 2.8, 1.5, 2.7],
+    [2.0, 2.3, 2.5, 3.0, 3.0, 2.0, 2.0, 2.2],
+    [1.7, 1.6, 1.8, 2.0, 2.0, 1.2, 1.5, 1.7],
+    [1.3, 1.4, 1.0, 1.0, 1.0, 1.0, 1.4, 1.3],
+    [1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0],
+    [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
+]
+
+_KNIGHT_MAP = 0.3, [
+    [3.0, 4.0, 5.0, 5.0, 5.0, 5.0, 4.0, 3.0],
+    [5.0, 6.0, 7.0, 7.0, 7.0, 7.0, 6.0, 5.0],
+    [6.0, 7.0, 8.0, 8.0, 8.0, 8.0, 7.0, 6.0],
+    [5.0, 6.0, 7.0, 7.0, 7.0, 7.0, 6.0, 5.0],
+    [4.0, 5.0, 6.0, 6.0, 6.0, 6.0, 5.0, 4.0],
+    [3.0, 4.0, 5.0, 5.0, 5.0, 5.0, 4.0, 3.0],
+    [2.0, 3.0, 4.0, 4.0, 4.0, 4.0, 3.0, 2.0],
+    [1.0, 2.0, 3.0, 3.0, 1.0, 1.0, 1.0, 1.0],
+]
+
+_BISHOP_MAP = 0.3, [
+    [1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0],
+    [1.0, 2.0, 2.0, 2.0, 2.0, 2.0, 2.0, 1.0],
+    [1.0, 3.0, 2.0, 2.0, 2.0, 2.0, 3.0, 1.0],
+    [3.0, 5.0, 4.0, 4.0, 4.0, 4.0, 5.0, 3.0],
+    [1.0, 4.0, 4.0, 3.0, 3.0, 4.0, 4.0, 1.0],
+    [2.0, 4.0, 5.0, 4.0, 4.0, 5.0, 4.0, 2.0],
+    [3.0, 6.0, 4.0, 3.0, 3.0, 4.0, 6.0, 3.0],
+    [4.0, 3.0, 2.0, 1.0, 1.0, 1.0, 1.0, 1.0],
+]
+
+_ROOK_MAP = 0.3, [
+    [5.0, 5.0, 5.0, 5.0, 5.0, 5.0, 5.0, 5.0],
+    [4.0, 4.0, 4.0, 4.0, 4.0, 4.0, 4.0, 4.0],
+    [3.0, 4.0, 5.0, 5.0, 5.0, 5.0, 4.0, 4.0],
+    [1.0, 2.0, 3.0, 3.0, 3.0, 3.0, 2.0, 1.0],
+    [1.0, 2.0, 3.0, 3.0, 3.0, 3.0, 2.0, 1.0],
+    [1.0, 2.0, 3.0, 3.0, 3.0, 3.0, 2.0, 1.0],
+    [6.0, 7.0, 9.0, 9.0, 9.0, 9.0, 7.0, 6.0],
+    [7.0, 8.0, 10.0, 10.0, 10.0, 10.0, 8.0, 7.0],
+]
+
+_QUEEN_MAP = 0.3, [
+    [4.0, 5.0, 7.0, 7.0, 7.0, 7.0, 4.0, 5.0],
+    [4.0, 5.0, 7.0, 7.0, 7.0, 7.0, 4.0, 5.0],
+    [6.0, 8.0, 10.0, 10.0, 10.0, 10.0, 8.0, 6.0],
+    [6.0, 7.0, 9.0, 9.0, 9.0, 9.0, 7.0, 6.0],
+    [5.0, 6.0, 8.0, 8.0, 8.0, 8.0, 6.0, 5.0],
+    [2.0, 3.0, 5.0, 6.0, 6.0, 5.0, 3.0, 2.0],
+    [2.0, 2.0, 3.0, 5.0, 5.0, 3.0, 2.0, 2.0],
+    [1.0, 2.0, 3.0, 4.0, 4.0, 5.0, 2.0, 1.0],
+]
+
+_KING_MAP = 0.4, [
+    [1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0],
+    [1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0],
+    [1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0],
+    [1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0],
+    [1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0],
+    [1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0],
+    [3.0, 4.0, 1.0, 1.0, 1.0, 1.0, 4.0, 9.0],
+    [4.0, 7.0, 7.0, 5.0, 1.0, 6.0, 10.0, 9.0],
+]
+
+# In the endgame the king belongs in the center and passed pawns run
+_ENDGAME_PAWN_MAP = 0.3, [
+    [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
+    [12.0, 12.0, 12.0, 12.0, 12.0, 12.0, 12.0, 12.0],
+    [8.0, 8.0, 8.0, 8.0, 8.0, 8.0, 8.0, 8.0],
+    [5.0, 5.0, 5.0, 5.0, 5.0, 5.0, 5.0, 5.0],
+    [3.0, 3.0, 3.0, 3.0, 3.0, 3.0, 3.0, 3.0],
+    [2.0, 2.0, 2.0, 2.0, 2.0, 2.0, 2.0, 2.0],
+    [1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0],
+    [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
+]
+
+_ENDGAME_KING_MAP = 0.4, [
+    [0.0, 1.0, 2.0, 3.0, 3.0, 2.0, 1.0, 0.0],
+    [1.0, 3.0, 4.0, 5.0, 5.0, 4.0, 3.0, 1.0],
+    [2.0, 4.0, 6.0, 7.0, 7.0, 6.0, 4.0, 2.0],
+    [3.0, 5.0, 7.0, 8.0, 8.0, 7.0, 5.0, 3.0],
+    [3.0, 5.0, 7.0, 8.0, 8.0, 7.0, 5.0, 3.0],
+    [2.0, 4.0, 6.0, 7.0, 7.0, 6.0, 4.0, 2.0],
+    [1.0, 3.0, 4.0, 5.0, 5.0, 4.0, 3.0, 1.0],
+    [0.0, 1.0, 2.0, 3.0, 3.0, 2.0, 1.0, 0.0],
+]
+
+_MIDDLEGAME_MAPS = {
+    chess.PAWN: _PAWN_MAP,
+    chess.KNIGHT: _KNIGHT_MAP,
+    chess.BISHOP: _BISHOP_MAP,
+    chess.ROOK: _ROOK_MAP,
+    chess.QUEEN: _QUEEN_MAP,
+    chess.KING: _KING_MAP,
+}
+_ENDGAME_MAPS = {
+    **_MIDDLEGAME_MAPS,
+    chess.PAWN: _ENDGAME_PAWN_MAP,
+    chess.KING: _ENDGAME_KING_MAP,
+}
+
+# Game phase, from MAX_PHASE with all pieces on the board down to 0 with only
+# kings and pawns left
+PHASE_WEIGHTS = [0, 0, 1, 1, 2, 4, 0]
+MAX_PHASE = 24
+
+
+def _table(weight, rows, piece_type, color):
+    if color == chess.WHITE:
+        rows = rows[::-1]
+    sign = 1 if color == chess.WHITE else -1
+    material = PIECE_VALUES[piece_type] * EVALUATION_SCALE
+    return [
+        sign * (material + round(0.1 * weight * value * EVALUATION_SCALE))
+        for row in rows
+        for value in row
+    ]
+
+
+# Values of a piece from white's point of view, indexed by color and piece
+# type, and for the tables also by square. The tables include the material.
+MATERIAL_VALUES = [
+    [None]
+    + [
+        (1 if color == chess.WHITE else -1) * PIECE_VALUES[piece_type] * EVALUATION_SCALE
+        for piece_type in chess.PIECE_TYPES
+    ]
+    for color in (chess.BLACK, chess.WHITE)
+]
+MIDDLEGAME_TABLES = [
+    [None]
+    + [
+        _table(*_MIDDLEGAME_MAPS[piece_type], piece_type, color)
+        for piece_type in chess.PIECE_TYPES
+    ]
+    for color in (chess.BLACK, chess.WHITE)
+]
+ENDGAME_TABLES = [
+    [None]
+    + [
+        _table(*_ENDGAME_MAPS[piece_type], piece_type, color)
+        for piece_type in chess.PIECE_TYPES
+    ]
+    for color in (chess.BLACK, chess.WHITE)
+]
+
+
+def tapered(middlegame: int, endgame: int, phase: int) -> int:
+    """Blend of the middlegame and endgame value by a phase up to MAX_PHASE."""
+    return (middlegame * phase + endgame * (MAX_PHASE - phase)) // MAX_PHASE
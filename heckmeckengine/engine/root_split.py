@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import chess
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from typing import Iterable, List, Optional, Tuple
+
+from heckmeckengine.engine.evaluation import Evaluation, load_weights
+from heckmeckengine.engine.heckmeck_board import HeckmeckBoard
+from heckmeckengine.engine.nnue import Network
+from heckmeckengine.engine.transposition_table import TranspositionTable
+from heckmeckengine.engine.search_tree import SearchTree
+
+# Search state of a worker process, kept warm between tasks
+_board = None
+_evaluation = None
+_transposition_table = None
+_stop_event = None
+
+
+def _initialize_worker(
+    hash_size_mb: float,
+    eval_file: Optional[str],
+    weights_file: Optional[str],
+    stop_event,
+):
+    global _board, _evaluation, _transposition_table, _stop_event
+    _stop_event = stop_event
+    if weights_file is not None:
+        load_weights(weights_file)
+    _board = HeckmeckBoard()
+    network = None if eval_file is None else Network(eval_file)
+    _evaluation = Evaluation(_board, network=network)
+    _transposition_table = TranspositionTable(hash_size_mb)
+
+
+def _is_ready() -> bool:
+    return True
+
+
+def _search_move(
+    fen: str,
+    moves: List[str],
+    depth: int,
+    alpha: int,
+    beta: int,
+    age: int,
+    search_options: dict,
+) -> Tuple[int, List[str], int, int]:
+    _board.set_fen(fen)
+    for move in moves:
+        _board.push_uci(move)
+    _transposition_table.age = age
+
+    # The move is searched one ply below the root, so that repetitions, mate
+    # distances and table cutoffs are handled as in the local search
+    tree = SearchTree(
+        board=_board,
+        color=not _board.turn,
+        evaluation=_evaluation,
+        max_depth=depth,
+        start_depth=depth,
+        transposition_table=_transposition_table,
+        stop_event=_stop_event,
+        **search_options,
+    )
+    score = -tree.search_root(-beta, -alpha, ply=1)
+    return (
+        score,
+        [move.uci() for move in tree.principal_variation],
+        tree.statistics.nodes,
+        tree.statistics.quiescence_nodes,
+    )
+
+
+class RootSplitPool:
+    """Pool of warm worker processes that search single root moves.
+
+    Workers keep their board, evaluation and transposition table between tasks,
+    so the process start up is only paid once when the pool is created. The
+    position is passed as FEN plus move history to keep repetitions intact.
+    """
+
+    def __init__(
+        self,
+        num_workers: int,
+        hash_size_mb: float = 16,
+        eval_file: Optional[str] = None,
+        weights_file: Optional[str] = None,
+    ):
+        self.num_workers = num_workers
+        self._stop_event = multiprocessing.Event()
+        self._executor = ProcessPoolExecutor(
+            max_workers=num_workers,
+            initializer=_initialize_worker,
+            initargs=(hash_size_mb, eval_file, weights_file, self._stop_event),
+        )
+        for future in [self._executor.submit(_is_ready) for _ in range(num_workers)]:
+            future.result()
+
+    def submit(
+        self,
+        board: HeckmeckBoard,
+        move: chess.Move,
+        depth: int,
+        alpha: int,
+        beta: int,
+        age: int,
+        search_options: dict,
+    ) -> Future:
+        """Search `move` of `board` to `depth` plies below the root.
+
+        The future resolves to the score from the point of view of the side to
+        move on `board`, the principal variation after `move` and the numbers
+        of regular and quiescence nodes.
+        """
+        moves = [move.uci() for move in board.move_stack]
+        moves.append(move.uci())
+        return self._executor.submit(
+            _search_move,
+            board.root().fen(),
+            moves,
+            depth,
+            alpha,
+            beta,
+            age,
+            search_options,
+        )
+
+    def stop(self, futures: Iterable[Future]):
+        """Abort the searches of `futures`, also the ones already running."""
+        futures = list(futures)
+        for future in futures:
+            future.cancel()
+        self._stop_event.set()
+        wait(futures)
+        self._stop_event.clear()
+
+    def close(self):
+        self._executor.shutdown()
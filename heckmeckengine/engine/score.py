@@ -6,12 +6,43 @@ from typing import Optional
 
 import logging
 
+# Inside the search scores are plain integers in centipawns from the point of
+# view of the side to move. Values from MATE_BOUND on are reserved for mates.
+CENTIPAWNS = 100
+MATE_VALUE = 30000
+MATE_BOUND = MATE_VALUE - 1000
+INFINITE_VALUE = MATE_VALUE + 1
+
+
+def mate_in(value: int) -> Optional[int]:
+    """Moves until mate for an integer search score, negative if being mated."""
+    if -MATE_BOUND < value < MATE_BOUND:
+        return None
+    moves = (MATE_VALUE - abs(value) + 1) // 2
+    return moves if value > 0 else -moves
+
 
 @dataclass
 class Score:
     value: float
     termination: Optional[chess.Termination] = None
 
+    @classmethod
+    def from_int(cls, value: int) -> "Score":
+        if value >= MATE_BOUND:
+            return cls(math.inf, chess.Termination.CHECKMATE)
+        elif value <= -MATE_BOUND:
+            return cls(-math.inf, chess.Termination.CHECKMATE)
+        return cls(value / CENTIPAWNS)
+
+    def to_int(self) -> int:
+        if self.termination is chess.Termination.CHECKMATE:
+            return MATE_VALUE if self.value > 0 else -MATE_VALUE
+        elif self.termination is not None:
+            return 0
+        value = round(self.value * CENTIPAWNS)
+        return max(-MATE_BOUND + 1, min(value, MATE_BOUND - 1))
+
     def __rmul__(self, other):
         return Score(other * self.value, self.termination)
 
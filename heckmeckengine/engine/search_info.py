@@ -0,0 +1,27 @@
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from heckmeckengine.engine.score import Score
+from heckmeckengine.engine.annotated_move import AnnotatedMove
+
+
+@dataclass
+class SearchInfo:
+    """Progress of a running search, time in seconds.
+
+    Reports sent during an iteration have neither score nor principal variation.
+    For mate scores, `mate` holds the number of moves until mate, negative if
+    the side to move is mated.
+    """
+
+    depth: int
+    seldepth: int
+    time: float
+    nodes: int
+    score: Optional[Score] = None
+    principal_variation: List[AnnotatedMove] = field(default_factory=list)
+    mate: Optional[int] = None
+
+    @property
+    def nps(self) -> int:
+        return int(self.nodes / self.time) if self.time > 0 else 0
@@ -0,0 +1,68 @@
+import chess
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+# Time reserved for communication with the GUI, in milliseconds
+_MOVE_OVERHEAD = 50
+
+# Expected number of remaining moves when the time control does not tell
+_DEFAULT_MOVES_TO_GO = 30
+
+# The hard limit allows a few times the planned time for one move, but never
+# more than a fraction of the remaining time
+_HARD_LIMIT_FACTOR = 4
+_MAX_TIME_FRACTION = 0.5
+
+
+@dataclass
+class SearchLimits:
+    """Limits of a search as given by the UCI `go` command, times in milliseconds."""
+
+    wtime: Optional[int] = None
+    btime: Optional[int] = None
+    winc: Optional[int] = None
+    binc: Optional[int] = None
+    movestogo: Optional[int] = None
+    movetime: Optional[int] = None
+    depth: Optional[int] = None
+    nodes: Optional[int] = None
+    infinite: bool = False
+    ponder: bool = False
+
+    @property
+    def is_bounded(self) -> bool:
+        # Whether the search ends by itself without a depth limit
+        return not self.infinite and (
+            self.wtime is not None
+            or self.btime is not None
+            or self.movetime is not None
+            or self.nodes is not None
+        )
+
+    def time_limits(
+        self, color: chess.Color
+    ) -> Tuple[Optional[float], Optional[float]]:
+        """Soft and hard time limit in seconds for `color` to move.
+
+        No new iteration is started after the soft limit, the search is aborted
+        at the hard limit.
+        """
+        if self.infinite:
+            return None, None
+
+        if self.movetime is not None:
+            limit = max(self.movetime - _MOVE_OVERHEAD, 1) / 1000
+            return limit, limit
+
+        time_left = self.wtime if color == chess.WHITE else self.btime
+        if time_left is None:
+            return None, None
+        increment = (self.winc if color == chess.WHITE else self.binc) or 0
+        moves_to_go = self.movestogo or _DEFAULT_MOVES_TO_GO
+
+        available = max(time_left - _MOVE_OVERHEAD, 1)
+        soft = min(available / moves_to_go + increment, available)
+        hard = max(
+            min(soft * _HARD_LIMIT_FACTOR, available * _MAX_TIME_FRACTION), soft
+        )
+        return soft / 1000, hard / 1000
@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class SearchMode(Enum):
+    ALPHA_BETA = "AlphaBeta"
+    MTDF = "MTDf"
+    PVS = "PVS"
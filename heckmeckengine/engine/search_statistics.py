@@ -0,0 +1,54 @@
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+
+@dataclass
+class SearchStatistics:
+    nodes: int = 0
+    quiescence_nodes: int = 0
+    seldepth: int = 0
+    root_searches: int = 0
+    pvs_re_searches: int = 0
+    aspiration_re_searches: int = 0
+    null_move_cutoffs: int = 0
+    null_move_verification_failures: int = 0
+    late_move_reductions: int = 0
+    late_move_re_searches: int = 0
+    futility_pruned_moves: int = 0
+    razored_nodes: int = 0
+    mate_distance_prunes: int = 0
+    draws_by_rule: int = 0
+    beta_cutoffs: int = 0
+    first_move_cutoffs: int = 0
+    transposition_probes: int = 0
+    transposition_hits: int = 0
+
+    # Seconds and nodes of every finished iteration
+    iteration_times: List[float] = field(default_factory=list)
+    iteration_nodes: List[int] = field(default_factory=list)
+
+    @property
+    def total_nodes(self) -> int:
+        return self.nodes + self.quiescence_nodes
+
+    @property
+    def effective_branching_factor(self) -> Optional[float]:
+        # Growth of the tree from the second last to the last iteration
+        if len(self.iteration_nodes) < 2 or self.iteration_nodes[-2] == 0:
+            return None
+        return self.iteration_nodes[-1] / self.iteration_nodes[-2]
+
+    @property
+    def beta_cutoff_rate(self) -> float:
+        return self.beta_cutoffs / self.nodes if self.nodes else 0.0
+
+    @property
+    def first_move_cutoff_rate(self) -> float:
+        # Share of beta cutoffs caused by the first move, i.e. the move ordering
+        return self.first_move_cutoffs / self.beta_cutoffs if self.beta_cutoffs else 0.0
+
+    @property
+    def transposition_hit_rate(self) -> float:
+        if not self.transposition_probes:
+            return 0.0
+        return self.transposition_hits / self.transposition_probes
@@ -1,19 +1,98 @@
 from __future__ import annotations
 
 import chess
-import numpy as np
 import logging
-from typing import Iterable, Union
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from itertools import islice
+from multiprocessing.synchronize import Event
+from typing import TYPE_CHECKING, Callable, Iterable, List, Optional, Union
 
 
 from heckmeckengine.engine.evaluation import Evaluation, EvaluationTarget
-from heckmeckengine.engine.search_node import SearchNode
-from heckmeckengine.engine.score import Score
+from heckmeckengine.engine.score import (
+    CENTIPAWNS,
+    INFINITE_VALUE,
+    MATE_BOUND,
+    MATE_VALUE,
+    Score,
+    mate_in,
+)
 from heckmeckengine.engine.annotated_move import AnnotatedMove
 from heckmeckengine.engine.heckmeck_board import HeckmeckBoard
+from heckmeckengine.engine.transposition_table import Bound, TranspositionTable
+from heckmeckengine.engine.search_mode import SearchMode
+from heckmeckengine.engine.search_statistics import SearchStatistics
+from heckmeckengine.engine.search_info import SearchInfo
+
+if TYPE_CHECKING:
+    from heckmeckengine.engine.root_split import RootSplitPool
 
 LOGGER = logging.getLogger("search_tree")
 
+# Depth of the preallocated principal variation table. Quiescence search does
+# not use it, so this only has to exceed the nominal search depth.
+_MAX_PLY = 128
+
+# Width of the zero windows searched by MTD(f) and the PVS scouts. Scores are
+# integer centipawns, so this is the smallest possible difference.
+_NULL_WINDOW = 1
+
+# Half width of the first aspiration window, doubled after every fail. Beyond
+# the limit the failing side of the window is opened completely.
+_ASPIRATION_WINDOW = 25
+_ASPIRATION_LIMIT = 400
+
+# Null move pruning is verified by a reduced search when the side to move has
+# at most this many pieces besides king and pawns, as zugzwang becomes likely.
+_NULL_MOVE_VERIFICATION_PIECES = 2
+
+# Late move reductions only apply to nodes with at least this remaining depth.
+# Razoring applies to nodes with at most this remaining depth, futility pruning
+# to frontier nodes, i.e. nodes with a remaining depth of one.
+_LATE_MOVE_REDUCTION_DEPTH = 3
+_RAZORING_DEPTH = 2
+
+# Number of nodes between two checks whether the search has to stop
+_STOP_CHECK_INTERVAL = 1024
+
+# Seconds between two progress reports during an iteration
+_INFO_INTERVAL = 1.0
+
+# Seconds between two checks whether to stop while waiting for root moves
+# searched by the pool
+_STOP_POLL_INTERVAL = 0.01
+
+# Positional slack allowed on top of the material won by a capture before
+# delta pruning skips it in the quiescence search.
+_DELTA_MARGIN = 200
+
+
+class _SearchStopped(Exception):
+    pass
+
+
+def _is_bounded(value: int) -> bool:
+    return -MATE_BOUND < value < MATE_BOUND
+
+
+# Mate scores count the plies from the root. The transposition table stores
+# them relative to the node, as the same node can be reached at other plies.
+def _mate_at_ply(value: int, ply: int) -> int:
+    if value >= MATE_BOUND:
+        return value - ply
+    elif value <= -MATE_BOUND:
+        return value + ply
+    return value
+
+
+def _to_table(value: int, ply: int) -> int:
+    if value >= MATE_BOUND:
+        return value + ply
+    elif value <= -MATE_BOUND:
+        return value - ply
+    return value
+
 
 class SearchTree:
     def __init__(
@@ -23,115 +102,741 @@ class SearchTree:
         evaluation: Evaluation,
         max_depth: int,
         start_depth: int = 2,
+        transposition_table: Optional[TranspositionTable] = None,
+        search_mode: SearchMode = SearchMode.ALPHA_BETA,
+        null_move_reduction: Optional[int] = 2,
+        late_move_reduction: Optional[int] = 1,
+        late_move_threshold: int = 3,
+        futility_margin: Optional[int] = 200,
+        razoring_margin: Optional[int] = 300,
+        stop_event: Optional[Event] = None,
+        root_split_pool: Optional[RootSplitPool] = None,
+        soft_time_limit: Optional[float] = None,
+        hard_time_limit: Optional[float] = None,
+        node_limit: Optional[int] = None,
+        ponderhit_event: Optional[Event] = None,
+        principal_variation: Optional[List[AnnotatedMove]] = None,
+        value: Optional[int] = None,
+        info_callback: Optional[Callable[[SearchInfo], None]] = None,
     ):
         self.board = board
         self.color = color
         self.evaluation = evaluation
+        if transposition_table is None:
+            transposition_table = TranspositionTable()
+        self.transposition_table = transposition_table
+        self.search_mode = search_mode
+        self.null_move_reduction = null_move_reduction
+        self.late_move_reduction = late_move_reduction
+        self.late_move_threshold = late_move_threshold
+        self.futility_margin = futility_margin
+        self.razoring_margin = razoring_margin
+        self.stop_event = stop_event
+        self.root_split_pool = root_split_pool
+        self.soft_time_limit = soft_time_limit
+        self.hard_time_limit = hard_time_limit
+        self.node_limit = node_limit
+        self.ponderhit_event = ponderhit_event
+        self.info_callback = info_callback
+        self._search_start = None
+        self._last_info_time = None
+        self._start_time = None
+        self._hard_deadline = None
+
+        # While pondering the time limits are ignored, they apply from the
+        # moment the ponder move is played
+        self._pondering = ponderhit_event is not None
+        self._stop_countdown = _STOP_CHECK_INTERVAL
+        self.statistics = SearchStatistics()
+        self._piece_values = {
+            piece_type: round(worth * CENTIPAWNS)
+            for piece_type, worth in evaluation.piece_worth.items()
+        }
+        self._max_capture_gain = (
+            2 * self._piece_values[chess.QUEEN]
+            - self._piece_values[chess.PAWN]
+            + _DELTA_MARGIN
+        )
         self._current_depth = start_depth
         self.max_depth = max_depth
 
-        self.root = SearchNode(
-            board=self.board,
-            max_depth=0,
-            iteration=-1,
-            alpha=Score(-np.inf),
-            beta=Score(np.inf),
-            sign=1,
+        # Result of the last finished iteration, initially the expected result
+        # if the position was anticipated by an earlier search
+        self.completed_depth = 0
+        self.value = value
+        self.score = None if value is None else Score.from_int(value)
+        self.principal_variation = list(principal_variation or [])
+
+        # Triangular principal variation table, row ply holds the best line
+        # found from the node at that ply on the current path.
+        self._pv_table = [[None] * _MAX_PLY for _ in range(_MAX_PLY)]
+        self._pv_length = [0] * _MAX_PLY
+
+        # Window of the running root search and the best score within it, a
+        # root move improved on the window only if the score exceeds alpha
+        self._root_alpha = -INFINITE_VALUE
+        self._root_value = None
+
+    def _alpha_beta_search(
+        self,
+        depth: int,
+        alpha: int,
+        beta: int,
+        ply: int,
+        on_pv: bool = False,
+        allow_null_move: bool = True,
+    ) -> int:
+        self.statistics.nodes += 1
+        self._check_stop()
+        if ply > self.statistics.seldepth:
+            self.statistics.seldepth = ply
+        self._pv_length[ply] = 0
+        sign = -1 if ply & 1 else 1
+        is_root = ply == 0
+
+        if not is_root:
+            # Mate distance pruning, no line from here can beat a mate that
+            # is already known to be shorter
+            alpha = max(alpha, -MATE_VALUE + ply)
+            beta = min(beta, MATE_VALUE - ply - 1)
+            if alpha >= beta:
+                self.statistics.mate_distance_prunes += 1
+                return alpha
+
+            if self.board.is_draw_by_rule():
+                self.statistics.draws_by_rule += 1
+                return 0
+
+        if depth == 0:
+            return self._quiescence_search(alpha, beta, ply)
+
+        hash_move = None
+        key = self.board.zobrist_key
+        entry = self.transposition_table.probe(key)
+        self.statistics.transposition_probes += 1
+        if entry is not None:
+            self.statistics.transposition_hits += 1
+            hash_move = entry.move
+            if not is_root and entry.depth >= depth:
+                entry_score = _mate_at_ply(entry.score, ply)
+                if entry.bound == Bound.EXACT:
+                    return entry_score
+                elif entry.bound == Bound.LOWER:
+                    if entry_score > alpha:
+                        alpha = entry_score
+                elif entry_score < beta:
+                    beta = entry_score
+
+                if alpha >= beta:
+                    return entry_score
+
+        # Window after the table adjustments, used to classify the result
+        alpha_original = alpha
+
+        # Follow the principal variation of the previous iteration
+        previous_pv = self.principal_variation
+        pv_move = None
+        if on_pv and ply < len(previous_pv):
+            pv_move = previous_pv[ply]
+        if hash_move is not None:
+            pv_move = hash_move
+
+        principal_variation_search = self.search_mode == SearchMode.PVS
+        in_check = self.board.is_check()
+        try_null_move = (
+            allow_null_move
+            and self.null_move_reduction is not None
+            and not is_root
+            and depth > self.null_move_reduction
+            and _is_bounded(beta)
+            and self._has_non_pawn_material()
+            and not in_check
         )
 
-    def _alpha_beta_search(self, current_node: SearchNode) -> float:
-        if current_node.max_depth == 0:
-            evaluation = current_node.sign * self.evaluation.get(
-                EvaluationTarget.COMPLETE,
+        # Frontier pruning is based on the material balance only
+        futility_score = None
+        if (
+            not is_root
+            and not in_check
+            and depth <= _RAZORING_DEPTH
+            and _is_bounded(alpha)
+        ):
+            static_evaluation = sign * self.evaluation.get_value(
+                EvaluationTarget.FAST,
                 self.color,
+                check_outcome=False,
             )
-            current_node.score = evaluation
-            return evaluation
+            if _is_bounded(static_evaluation):
+                if (
+                    self.razoring_margin is not None
+                    and static_evaluation + self.razoring_margin < alpha
+                ):
+                    score = self._quiescence_search(alpha, alpha + _NULL_WINDOW, ply)
+                    if score <= alpha:
+                        self.statistics.razored_nodes += 1
+                        return score
 
+                if depth == 1 and self.futility_margin is not None:
+                    score = static_evaluation + self.futility_margin
+                    if score <= alpha:
+                        futility_score = score
+
+        may_reduce = (
+            self.late_move_reduction is not None
+            and depth >= _LATE_MOVE_REDUCTION_DEPTH
+            and not in_check
+        )
+
+        pv = self._pv_table[ply]
+        child_pv = self._pv_table[ply + 1]
         value = None
-        for child_node in current_node:
-            self.board.push(child_node.value)
-            child_score = -self._alpha_beta_search(child_node)
-            child_node.score = child_score
+        best_move = None
+        move_number = 0
+        for move in self.board.generate_sorted_legal_moves(
+            pv_move=pv_move,
+            generate_null_move=try_null_move,
+        ):
+            if not move:  # Null move
+                if self._null_move_search(depth, beta, ply):
+                    self.transposition_table.store(key, depth, Bound.LOWER, beta, None)
+                    return beta
+                continue
+
+            move_number += 1
+            reduction = 0
+            if (
+                value is not None
+                and (futility_score is not None or may_reduce)
+                and not self.board.is_capture(move)
+                and not move.promotion
+            ):
+                if futility_score is not None:
+                    if not self.board.gives_check(move):
+                        self.statistics.futility_pruned_moves += 1
+                        if value < futility_score:
+                            value = futility_score
+                        continue
+                elif (
+                    move_number > self.late_move_threshold
+                    and _is_bounded(alpha)
+                    and not self.board.gives_check(move)
+                ):
+                    reduction = self.late_move_reduction
+
+            child_on_pv = on_pv and move == pv_move
+            self.board.push(move)
+            child_score = None
+            if reduction:
+                # Late quiet moves are expected to fail low, prove it cheaply
+                self.statistics.late_move_reductions += 1
+                child_score = -self._alpha_beta_search(
+                    max(depth - 1 - reduction, 0),
+                    -alpha - _NULL_WINDOW,
+                    -alpha,
+                    ply + 1,
+                )
+                if alpha < child_score:
+                    self.statistics.late_move_re_searches += 1
+                    child_score = None
+
+            if child_score is not None:
+                pass
+            elif principal_variation_search and value is not None and _is_bounded(alpha):
+                # Scout with a null window, only a fail high needs the full one
+                child_score = -self._alpha_beta_search(
+                    depth - 1,
+                    -alpha - _NULL_WINDOW,
+                    -alpha,
+                    ply + 1,
+                )
+                if alpha < child_score < beta:
+                    self.statistics.pvs_re_searches += 1
+                    child_score = -self._alpha_beta_search(
+                        depth - 1, -beta, -alpha, ply + 1, child_on_pv
+                    )
+            else:
+                child_score = -self._alpha_beta_search(
+                    depth - 1, -beta, -alpha, ply + 1, child_on_pv
+                )
             self.board.pop()
 
             if value is None or child_score > value:
-                current_node.optimizing_node = child_node
                 value = child_score
+                best_move = move
+
+                pv_length = self._pv_length[ply + 1]
+                pv[0] = move
+                pv[1 : pv_length + 1] = child_pv[:pv_length]
+                self._pv_length[ply] = pv_length + 1
+                if is_root:
+                    self._root_value = value
 
-                if value > current_node.alpha:
-                    current_node.alpha = value
+                if value > alpha:
+                    alpha = value
 
-                    if current_node.alpha >= current_node.beta:  # beta cutoff
-                        move = child_node.value
-                        # if move.is_quiet:  # Found a new killer move
-                        #    self.move_generator.add_killer_move(move)
+                    if alpha >= beta:  # beta cutoff
+                        self.statistics.beta_cutoffs += 1
+                        if move_number == 1:
+                            self.statistics.first_move_cutoffs += 1
+                        if not self.board.is_capture(move) and not move.promotion:
+                            self.board.add_killer_move(move)
+                            self.board.add_history(move, depth)
                         break
 
-        if value is None:  # Terminal node
-            evaluation = current_node.sign * self.evaluation.get(
+        if value is None:  # Checkmate or stalemate
+            evaluation = -MATE_VALUE + ply if in_check else 0
+            self.transposition_table.store(
+                key, depth, Bound.EXACT, _to_table(evaluation, ply), None
+            )
+            return evaluation
+
+        if value <= alpha_original:
+            bound = Bound.UPPER
+        elif value >= beta:
+            bound = Bound.LOWER
+        else:
+            bound = Bound.EXACT
+        self.transposition_table.store(
+            key, depth, bound, _to_table(value, ply), best_move
+        )
+
+        return value
+
+    def _null_move_search(self, depth: int, beta: int, ply: int) -> bool:
+        # Whether the node still fails high after passing the turn
+        self.board.push(chess.Move.null())
+        score = -self._alpha_beta_search(
+            depth - 1 - self.null_move_reduction,
+            -beta,
+            -beta + _NULL_WINDOW,
+            ply + 1,
+            allow_null_move=False,  # No two null moves in a row
+        )
+        self.board.pop()
+        if score < beta:
+            return False
+
+        if self._is_zugzwang_prone():
+            # Passing might be the only good option. Confirm with a reduced
+            # search of the node itself that must not pass again.
+            score = self._alpha_beta_search(
+                depth - self.null_move_reduction,
+                beta - _NULL_WINDOW,
+                beta,
+                ply,
+                allow_null_move=False,
+            )
+            if score < beta:
+                self.statistics.null_move_verification_failures += 1
+                return False
+
+        self.statistics.null_move_cutoffs += 1
+        return True
+
+    def _check_stop(self):
+        self._stop_countdown -= 1
+        if self._stop_countdown:
+            return
+
+        self._stop_countdown = _STOP_CHECK_INTERVAL
+        if self._should_stop():
+            raise _SearchStopped()
+
+        if (
+            self.info_callback is not None
+            and time.monotonic() - self._last_info_time >= _INFO_INTERVAL
+        ):
+            self._send_info()
+
+    def _send_info(self, score: Optional[int] = None):
+        now = time.monotonic()
+        self._last_info_time = now
+        self.info_callback(
+            SearchInfo(
+                depth=self._current_depth,
+                seldepth=self.statistics.seldepth,
+                time=now - self._search_start,
+                nodes=self.statistics.total_nodes,
+                score=None if score is None else Score.from_int(score),
+                principal_variation=(
+                    self.principal_variation if score is not None else []
+                ),
+                mate=None if score is None else mate_in(score),
+            )
+        )
+
+    def _should_stop(self) -> bool:
+        if self.stop_event is not None and self.stop_event.is_set():
+            return True
+        if self._pondering and self.ponderhit_event.is_set():
+            self._pondering = False
+            self._start_clock()
+        if self._hard_deadline is not None and time.monotonic() >= self._hard_deadline:
+            return True
+        return (
+            self.node_limit is not None
+            and self.statistics.nodes + self.statistics.quiescence_nodes
+            >= self.node_limit
+        )
+
+    def _start_clock(self):
+        if self._pondering:
+            return
+
+        self._start_time = time.monotonic()
+        if self.hard_time_limit is not None:
+            self._hard_deadline = self._start_time + self.hard_time_limit
+
+    def _has_non_pawn_material(self) -> bool:
+        board = self.board
+        return bool(board.occupied_co[board.turn] & ~(board.pawns | board.kings))
+
+    def _is_zugzwang_prone(self) -> bool:
+        board = self.board
+        pieces = board.occupied_co[board.turn] & ~(board.pawns | board.kings)
+        return chess.popcount(pieces) <= _NULL_MOVE_VERIFICATION_PIECES
+
+    def _quiescence_search(self, alpha: int, beta: int, ply: int) -> int:
+        self.statistics.quiescence_nodes += 1
+        self._check_stop()
+        if ply > self.statistics.seldepth:
+            self.statistics.seldepth = ply
+        sign = -1 if ply & 1 else 1
+
+        # Captures can leave insufficient material
+        if self.board.is_draw_by_rule():
+            self.statistics.draws_by_rule += 1
+            return 0
+
+        in_check = self.board.is_check()
+        if in_check:  # No standing pat, all evasions are searched
+            stand_pat = None
+        else:
+            # Quiet positions without captures are scored even if they are
+            # stalemate
+            stand_pat = sign * self.evaluation.get_value(
                 EvaluationTarget.COMPLETE,
                 self.color,
+                check_outcome=False,
             )
-            current_node.score = evaluation
-            return evaluation
+            if stand_pat >= beta:
+                return stand_pat
+            if stand_pat > alpha:
+                alpha = stand_pat
+
+            # Delta pruning, not even winning a queen would raise alpha
+            if stand_pat + self._max_capture_gain < alpha:
+                return stand_pat
+
+        value = stand_pat
+        for move in self.board.generate_sorted_legal_moves(
+            pv_move=None,
+            captures_only=True,
+            skip_losing_captures=True,
+        ):
+            if stand_pat is not None:
+                if stand_pat + self._capture_gain(move) < alpha:
+                    continue
+
+            self.board.push(move)
+            score = -self._quiescence_search(-beta, -alpha, ply + 1)
+            self.board.pop()
+
+            if value is None or score > value:
+                value = score
 
-        current_node.score = value
+                if value > alpha:
+                    alpha = value
+
+                    if alpha >= beta:
+                        break
+
+        if value is None:  # Checkmate
+            value = -MATE_VALUE + ply
         return value
 
-    def _mtdf(self, f, eval_function, feedback_up, feedback_down):
-        g = f
-        upperbound = np.inf
-        lowerbound = -np.inf
+    def _capture_gain(self, move: AnnotatedMove) -> int:
+        piece_worth = self._piece_values
+        captured_piece_type = self.board.piece_type_at(move.to_square)
+        if captured_piece_type is None:  # En passant or promotion
+            gain = 0 if move.promotion else piece_worth[chess.PAWN]
+        else:
+            gain = piece_worth[captured_piece_type]
+
+        if move.promotion:
+            gain += piece_worth[move.promotion] - piece_worth[chess.PAWN]
+        return gain + _DELTA_MARGIN
+
+    def _mtdf(self, first_guess: int) -> int:
+        g = first_guess
+        upperbound = INFINITE_VALUE
+        lowerbound = -INFINITE_VALUE
+        cutoff_pv = None
         while lowerbound < upperbound:
-            if g == lowerbound:
-                beta = g + 1
+            beta = g + _NULL_WINDOW if g == lowerbound else g
+
+            score = self._alpha_beta_search(
+                self._current_depth,
+                beta - _NULL_WINDOW,
+                beta,
+                0,
+                on_pv=True,
+            )
+            self.statistics.root_searches += 1
+            g = score
+
+            if score < beta:
+                upperbound = score
             else:
-                beta = g
-
-            self.root.alpha = beta - 1
-            self.root.beta = beta
-            g = self._alpha_beta_search(
-                self.root,
-                eval_function,
-                feedback_up,
-                feedback_down,
-            )  # TODO: Add memory to alpha beta
-
-            if g < beta:
-                upperbound = g
+                lowerbound = score
+                cutoff_pv = self._root_principal_variation()
+
+        # After a fail low the root move is only an upper bound, the line of
+        # the last fail high is the one that proved the final score.
+        if cutoff_pv:
+            self._set_root_principal_variation(cutoff_pv)
+        self.transposition_table.store(
+            self.board.zobrist_key,
+            self._current_depth,
+            Bound.EXACT,
+            score,
+            self._pv_table[0][0],
+        )
+        return score
+
+    def _aspiration_search(self, previous_evaluation: Optional[int]) -> int:
+        if previous_evaluation is None or not _is_bounded(previous_evaluation):
+            return self._root_search(-INFINITE_VALUE, INFINITE_VALUE)
+
+        delta = _ASPIRATION_WINDOW
+        alpha = previous_evaluation - delta
+        beta = previous_evaluation + delta
+        while True:
+            score = self._root_search(alpha, beta)
+
+            if alpha > -INFINITE_VALUE and score <= alpha:
+                alpha = -INFINITE_VALUE if delta >= _ASPIRATION_LIMIT else alpha - delta
+            elif beta < INFINITE_VALUE and score >= beta:
+                beta = INFINITE_VALUE if delta >= _ASPIRATION_LIMIT else beta + delta
             else:
-                lowerbound = g
-        return g
+                return score
+
+            self.statistics.aspiration_re_searches += 1
+            delta *= 2
 
-    def _start_deepening_iteration(self):
-        self.root.max_depth = self._current_depth
-        self.root.alpha = Score(-np.inf)
-        self.root.beta = Score(np.inf)
+    def _root_search(self, alpha: int, beta: int) -> int:
+        self.statistics.root_searches += 1
+        self._root_alpha = alpha
+        self._root_value = None
+        return self._alpha_beta_search(
+            self._current_depth, alpha, beta, 0, on_pv=True
+        )
+
+    def _root_split_search(self) -> int:
+        # The first move is searched here, its score is the lower bound for
+        # the remaining moves which are searched by the pool.
+        self.statistics.root_searches += 1
+        self._pv_length[0] = 0
+        self._root_alpha = -INFINITE_VALUE
+        self._root_value = None
+        depth = self._current_depth
+        pv_move = self.principal_variation[0] if self.principal_variation else None
+        moves = self.board.generate_sorted_legal_moves(pv_move=pv_move)
+        first_move = next(moves, None)
+        if first_move is None:
+            return self._root_search(-INFINITE_VALUE, INFINITE_VALUE)
+
+        self.board.push(first_move)
+        value = -self._alpha_beta_search(
+            depth - 1, -INFINITE_VALUE, INFINITE_VALUE, 1, on_pv=True
+        )
+        self.board.pop()
+        self._set_root_principal_variation(
+            [first_move] + self._pv_table[1][: self._pv_length[1]]
+        )
+        self._root_value = value
+
+        pool = self.root_split_pool
+        search_options = self._search_options()
+        pending = {}
+
+        def submit(move: AnnotatedMove):
+            if self._hard_deadline is not None:
+                search_options["hard_time_limit"] = (
+                    self._hard_deadline - time.monotonic()
+                )
+            future = pool.submit(
+                self.board,
+                move,
+                depth - 1,
+                value,
+                INFINITE_VALUE,
+                self.transposition_table.age,
+                search_options,
+            )
+            pending[future] = move
+
+        # Keep every worker busy, later moves get the best bound so far
+        try:
+            for move in islice(moves, pool.num_workers):
+                submit(move)
+            while pending:
+                done, _ = wait(
+                    pending, timeout=_STOP_POLL_INTERVAL, return_when=FIRST_COMPLETED
+                )
+                if self._should_stop():
+                    raise _SearchStopped()
+
+                for future in done:
+                    move = pending.pop(future)
+                    score, line, nodes, quiescence_nodes = future.result()
+                    self.statistics.nodes += nodes
+                    self.statistics.quiescence_nodes += quiescence_nodes
+                    if value < score:
+                        value = score
+                        self._set_root_principal_variation(
+                            [move] + [AnnotatedMove.from_uci(uci) for uci in line]
+                        )
+                        self._root_value = value
+
+                    move = next(moves, None)
+                    if move is not None:
+                        submit(move)
+        finally:
+            if pending:
+                pool.stop(pending)
+
+        self.transposition_table.store(
+            self.board.zobrist_key, depth, Bound.EXACT, value, self._pv_table[0][0]
+        )
+        return value
+
+    def _set_root_principal_variation(self, principal_variation: List[AnnotatedMove]):
+        self._pv_table[0][: len(principal_variation)] = principal_variation
+        self._pv_length[0] = len(principal_variation)
 
-    def _iterative_deepening(self, iteration_callback):
-        evaluation = None
+    def _search_options(self) -> dict:
+        return dict(
+            search_mode=self.search_mode,
+            null_move_reduction=self.null_move_reduction,
+            late_move_reduction=self.late_move_reduction,
+            late_move_threshold=self.late_move_threshold,
+            futility_margin=self.futility_margin,
+            razoring_margin=self.razoring_margin,
+        )
+
+    def _root_principal_variation(self) -> List[AnnotatedMove]:
+        return self._pv_table[0][: self._pv_length[0]]
+
+    def _search_iteration(self, previous_evaluation: Optional[int]) -> int:
+        if self.root_split_pool is not None and self._current_depth > 1:
+            score = self._root_split_search()
+        elif self.search_mode == SearchMode.MTDF:
+            if previous_evaluation is None:
+                previous_evaluation = 0
+            score = self._mtdf(previous_evaluation)
+        elif self.search_mode == SearchMode.PVS:
+            score = self._aspiration_search(previous_evaluation)
+        else:
+            score = self._root_search(-INFINITE_VALUE, INFINITE_VALUE)
+
+        self.principal_variation = self._root_principal_variation()
+        return score
+
+    def _iterative_deepening(self, iteration_callback) -> Optional[int]:
+        evaluation = self.value
+        search_ply = len(self.board.move_stack)
         while self._current_depth <= self.max_depth:
-            # self._start_deepening_iteration()
-            self.root.max_depth = self._current_depth
-            evaluation = self._alpha_beta_search(self.root)
+            iteration_start = time.monotonic()
+            iteration_nodes = self.statistics.total_nodes
+            try:
+                evaluation = self._search_iteration(evaluation)
+            except _SearchStopped:
+                # Unwind the moves of the aborted iteration
+                while len(self.board.move_stack) > search_ply:
+                    self.board.pop()
+
+                # Root moves are searched best first, so a move that scored
+                # above alpha in the aborted iteration is at least as good as
+                # the previous choice. Below alpha, e.g. in a failed low
+                # aspiration window, the scores are only upper bounds. MTD(f)
+                # passes only return bounds, so not for them.
+                if (
+                    self.search_mode != SearchMode.MTDF
+                    and self._root_value is not None
+                    and self._root_value > self._root_alpha
+                ):
+                    self.principal_variation = self._root_principal_variation()
+                break
+            self.value = evaluation
+            self.score = Score.from_int(evaluation)
+            self.completed_depth = self._current_depth
+            self.statistics.iteration_times.append(time.monotonic() - iteration_start)
+            self.statistics.iteration_nodes.append(
+                self.statistics.total_nodes - iteration_nodes
+            )
+            if self.info_callback is not None:
+                self._send_info(evaluation)
             if iteration_callback is not None:
                 stop_iteration = iteration_callback(self._current_depth)
                 if stop_iteration:
                     break
 
+            # A mate within the searched depth cannot get any shorter
+            if not _is_bounded(evaluation) and (
+                MATE_VALUE - abs(evaluation) <= self._current_depth
+            ):
+                break
+            if self._should_stop():
+                break
+            if (
+                self.soft_time_limit is not None
+                and self._start_time is not None
+                and time.monotonic() - self._start_time >= self.soft_time_limit
+            ):
+                break
+
             self._current_depth += 1
         return evaluation
 
+    def search_root(self, alpha: int, beta: int, ply: int = 0) -> int:
+        """Search the root once at the start depth within (alpha, beta).
+
+        With `ply` the board is searched as a node that many plies below the
+        root of the tree, e.g. a root move searched by another process.
+        """
+        self._start_clock()
+        if not ply:
+            score = self._root_search(alpha, beta)
+            self.principal_variation = self._root_principal_variation()
+            return score
+
+        self.statistics.root_searches += 1
+        score = self._alpha_beta_search(
+            self._current_depth, alpha, beta, ply, on_pv=True
+        )
+        self.principal_variation = self._pv_table[ply][: self._pv_length[ply]]
+        return score
+
     def traverse_tree(
         self,
         iteration_callback=None,
-    ) -> AnnotatedMove:
-        evaluation = self._iterative_deepening(iteration_callback)
-
-        LOGGER.debug(f"Evaluation: {evaluation}")
-        node = self.root
-        while node.optimizing_node is not None:
-            LOGGER.debug(node.optimizing_node.value)
-            node = node.optimizing_node
-        return self.root.optimizing_node.value
+    ) -> Optional[AnnotatedMove]:
+        self._search_start = self._last_info_time = time.monotonic()
+        self._start_clock()
+        self.board.age_history()
+        self._iterative_deepening(iteration_callback)
+
+        statistics = self.statistics
+        LOGGER.debug(f"Evaluation: {self.score}")
+        LOGGER.debug(f"Statistics: {statistics}")
+        LOGGER.debug(
+            f"Branching factor: {statistics.effective_branching_factor}, "
+            f"beta cutoff rate: {statistics.beta_cutoff_rate:.3f}, "
+            f"first move cutoff rate: {statistics.first_move_cutoff_rate:.3f}, "
+            f"hash hit rate: {statistics.transposition_hit_rate:.3f}"
+        )
+        LOGGER.debug(f"Principal variation: {self.principal_variation}")
+        if not self.principal_variation:  # Stopped during the first iteration
+            return None
+        return self.principal_variation[0]
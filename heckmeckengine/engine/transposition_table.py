@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import chess
+from dataclasses import dataclass
+from enum import IntEnum
+from multiprocessing import shared_memory
+from typing import Optional
+
+from heckmeckengine.engine.annotated_move import AnnotatedMove
+
+
+class Bound(IntEnum):
+    EXACT = 1
+    LOWER = 2
+    UPPER = 3
+
+
+@dataclass
+class TranspositionEntry:
+    depth: int
+    bound: Bound
+    score: int
+    move: Optional[AnnotatedMove]
+
+
+# Every entry occupies three 64 bit words: the Zobrist key xor-ed with the other
+# two words, a packed data word and the score as a signed integer. The xor makes
+# entries torn by concurrent writers fail the key check instead of returning
+# mixed data, so the table can be shared without locks.
+_WORDS_PER_ENTRY = 3
+_BYTES_PER_ENTRY = 8 * _WORDS_PER_ENTRY
+
+_MOVE_MASK = 0xFFFF
+_DEPTH_SHIFT = 16
+_BOUND_SHIFT = 24
+_AGE_SHIFT = 32
+
+
+def _encode_move(move: Optional[chess.Move]) -> int:
+    if not move:
+        return 0
+    return move.from_square | move.to_square << 6 | (move.promotion or 0) << 12
+
+
+def _decode_move(code: int) -> Optional[AnnotatedMove]:
+    if code == 0:
+        return None
+    promotion = code >> 12
+    return AnnotatedMove(code & 0x3F, (code >> 6) & 0x3F, promotion or None)
+
+
+class TranspositionTable:
+    """Fixed-size, direct-mapped table of search results keyed by Zobrist key.
+
+    The number of entries follows from `size_mb`. Every key maps to exactly one
+    slot. When a slot is taken by a different position, the new result replaces
+    the old one unless the old one was stored during the current search
+    (see `new_search`) with a greater depth. Results for the same position are
+    always overwritten, but keep their best move if the new result has none.
+
+    With `shared=True` the table lives in shared memory, other processes can
+    use it through `TranspositionTable.attach(table.name, table.size_mb)`.
+    """
+
+    def __init__(
+        self,
+        size_mb: float = 16,
+        shared: bool = False,
+        name: Optional[str] = None,
+    ):
+        self.size_mb = size_mb
+        self.size = max(1, int(size_mb * 2**20) // _BYTES_PER_ENTRY)
+        num_bytes = self.size * _BYTES_PER_ENTRY
+
+        self._shared_memory = None
+        self._owns_shared_memory = False
+        if name is not None:
+            self._shared_memory = shared_memory.SharedMemory(name=name)
+            self._buffer = self._shared_memory.buf[:num_bytes]
+        elif shared:
+            self._shared_memory = shared_memory.SharedMemory(
+                create=True, size=num_bytes
+            )
+            self._owns_shared_memory = True
+            self._buffer = self._shared_memory.buf[:num_bytes]
+            self._buffer[:] = bytes(num_bytes)
+        else:
+            self._buffer = memoryview(bytearray(num_bytes))
+        self._words = self._buffer.cast("Q")
+        self._scores = self._buffer.cast("q")
+
+        self.age = 0
+        self.probes = 0
+        self.hits = 0
+
+    @classmethod
+    def attach(cls, name: str, size_mb: float) -> TranspositionTable:
+        return cls(size_mb, name=name)
+
+    @property
+    def name(self) -> Optional[str]:
+        if self._shared_memory is None:
+            return None
+        return self._shared_memory.name
+
+    def close(self):
+        if self._shared_memory is None:
+            return
+
+        self._words.release()
+        self._scores.release()
+        self._buffer.release()
+        self._shared_memory.close()
+        if self._owns_shared_memory:
+            self._shared_memory.unlink()
+        self._shared_memory = None
+
+    def new_search(self):
+        self.age = (self.age + 1) & 0xFF
+
+    def clear(self):
+        self._buffer[:] = bytes(len(self._buffer))
+        self.age = 0
+        self.probes = 0
+        self.hits = 0
+
+    def probe(self, key: int) -> Optional[TranspositionEntry]:
+        self.probes += 1
+
+        index = (key % self.size) * _WORDS_PER_ENTRY
+        data = self._words[index + 1]
+        if data == 0 or self._words[index] ^ data ^ self._words[index + 2] != key:
+            return None
+
+        self.hits += 1
+        return TranspositionEntry(
+            depth=(data >> _DEPTH_SHIFT) & 0xFF,
+            bound=Bound((data >> _BOUND_SHIFT) & 0x3),
+            score=self._scores[index + 2],
+            move=_decode_move(data & _MOVE_MASK),
+        )
+
+    def store(
+        self,
+        key: int,
+        depth: int,
+        bound: Bound,
+        score: int,
+        move: Optional[chess.Move],
+    ):
+        index = (key % self.size) * _WORDS_PER_ENTRY
+        old_data = self._words[index + 1]
+        move_code = _encode_move(move)
+
+        if old_data != 0:
+            old_key = self._words[index] ^ old_data ^ self._words[index + 2]
+            if old_key == key:
+                if move_code == 0:
+                    move_code = old_data & _MOVE_MASK
+            elif (
+                (old_data >> _AGE_SHIFT) & 0xFF == self.age
+                and (old_data >> _DEPTH_SHIFT) & 0xFF > depth
+            ):
+                return
+
+        data = (
+            move_code
+            | min(max(depth, 0), 0xFF) << _DEPTH_SHIFT
+            | bound << _BOUND_SHIFT
+            | self.age << _AGE_SHIFT
+        )
+        self._scores[index + 2] = score
+        self._words[index + 1] = data
+        self._words[index] = key ^ data ^ self._words[index + 2]
@@ -0,0 +1,355 @@
+import re
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+import chess
+import numpy as np
+
+from heckmeckengine.engine.pawn_structure import (
+    KING_SHIELD_WEIGHTS,
+    PAWN_STRUCTURE_WEIGHTS,
+    king_shield_terms,
+    pawn_structure_terms,
+    popcount,
+)
+from heckmeckengine.engine.piece_square_tables import (
+    EVALUATION_SCALE,
+    MAX_PHASE,
+    PHASE_WEIGHTS,
+)
+
+# Texel tuning of the handcrafted evaluation: the complete evaluation is linear
+# in its weights, so a set of positions becomes a sparse feature matrix and the
+# weights are fitted to the game results with gradient descent on
+# (result - sigmoid(scaling * evaluation))**2.
+#
+# The parameters are in pawns, in this order: the middlegame and the endgame
+# value of every piece type and square of white, then the pawn structure and
+# the king shield weights.
+NUM_PIECE_SQUARES = 6 * 64
+_PAWN_TERMS = len(PAWN_STRUCTURE_WEIGHTS) + len(KING_SHIELD_WEIGHTS)
+NUM_PARAMETERS = 2 * NUM_PIECE_SQUARES + _PAWN_TERMS
+MAX_PIECES = 32
+
+# Pieces in the order of `board_bitboards`
+_SYMBOLS = np.frombuffer(b"PNBRQKpnbrqk", dtype=np.uint8)
+
+# A piece placement with its digits expanded is read rank 8 first
+_SQUARE_ORDER = np.array([square ^ 56 for square in chess.SQUARES])
+_BITS = np.array([1 << bit for bit in range(8)], dtype=np.uint8)
+
+# Piece-square column and sign of every bit plane, black's pieces count for
+# the mirrored square of white
+_COLUMNS = np.array(
+    [
+        (piece_type - 1) * 64 + (square if color == chess.WHITE else square ^ 56)
+        for color in (chess.WHITE, chess.BLACK)
+        for piece_type in chess.PIECE_TYPES
+        for square in chess.SQUARES
+    ],
+    dtype=np.int16,
+)
+_SIGNS = np.repeat(np.array([1, -1], dtype=np.int8), NUM_PIECE_SQUARES)
+_PHASES = np.array(PHASE_WEIGHTS[1:] * 2, dtype=np.int64)
+
+_RESULTS = {"1-0": 1.0, "0-1": 0.0, "1/2-1/2": 0.5}
+_RESULT = re.compile(r"1/2-1/2|1-0|0-1|\[(\d*\.?\d+)\]")
+
+# Positions extracted or evaluated at once, bounds the temporary arrays
+_CHUNK_SIZE = 1 << 16
+
+
+@dataclass
+class Features:
+    """Sparse features of a set of positions, see `extract_features`.
+
+    The piece-square features are kept as MAX_PIECES columns per position.
+    Unused slots point to the column NUM_PIECE_SQUARES and have sign zero.
+    """
+
+    piece_squares: np.ndarray
+    signs: np.ndarray
+    # Share of the middlegame value in the tapered evaluation
+    phases: np.ndarray
+    # Pawn structure terms, then king shield terms
+    pawn_terms: np.ndarray
+    results: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+    def chunks(self, chunk_size: int = _CHUNK_SIZE) -> Iterator["Features"]:
+        for start in range(0, len(self), chunk_size):
+            yield Features(
+                self.piece_squares[start : start + chunk_size],
+                self.signs[start : start + chunk_size],
+                self.phases[start : start + chunk_size],
+                self.pawn_terms[start : start + chunk_size],
+                self.results[start : start + chunk_size],
+            )
+
+    @classmethod
+    def concatenate(cls, features: List["Features"]) -> "Features":
+        return cls(
+            *(
+                np.concatenate([chunk.__dict__[name] for chunk in features])
+                for name in cls.__dataclass_fields__
+            )
+        )
+
+
+def read_positions(lines: Iterable[str]) -> Iterator[Tuple[str, float]]:
+    """Piece placements and results from white's point of view.
+
+    The lines are EPD or FEN records. The result is a game result like `1-0`,
+    e.g. in a `c9` opcode, or a score in brackets like `[0.5]`. Lines without
+    a result are skipped.
+    """
+    for line in lines:
+        match = _RESULT.search(line)
+        if match is None:
+            continue
+        if match.group(1) is not None:
+            result = float(match.group(1))
+        else:
+            result = _RESULTS[match.group(0)]
+        yield line.split(maxsplit=1)[0], result
+
+
+def placement_bitboards(placements: List[str]) -> np.ndarray:
+    """Piece bitboards of FEN piece placements, as by `board_bitboards`."""
+    characters = np.frombuffer("".join(placements).encode(), dtype=np.uint8)
+    lengths = np.fromiter(map(len, placements), dtype=np.int64, count=len(placements))
+    if not len(characters):
+        return np.zeros((len(placements), len(_SYMBOLS)), dtype="<u8")
+
+    # Every digit stands for that many empty squares, the slashes for none
+    digits = (characters >= ord("1")) & (characters <= ord("8"))
+    counts = np.where(digits, characters - ord("0"), characters != ord("/"))
+    starts = np.cumsum(lengths) - lengths
+    invalid = np.add.reduceat(counts, starts) != 64
+    if invalid.any():
+        placement = placements[int(np.argmax(invalid))]
+        raise ValueError(f"Invalid piece placement {placement}")
+    squares = np.repeat(np.where(digits, np.uint8(ord(".")), characters), counts)
+    squares = squares.reshape(-1, 64).take(_SQUARE_ORDER, axis=1)
+
+    # One byte of a bitboard per rank
+    planes = squares[:, np.newaxis, :] == _SYMBOLS[:, np.newaxis]
+    planes = planes.reshape(len(placements), len(_SYMBOLS), 8, 8).view(np.uint8)
+    ranks = (planes * _BITS).sum(axis=3, dtype=np.uint8)
+    return ranks.view("<u8").reshape(-1, len(_SYMBOLS))
+
+
+def extract_features(bitboards: np.ndarray, results: np.ndarray) -> Features:
+    """Features of positions given by rows of bitboards, see `board_bitboards`."""
+    bitboards = np.asarray(bitboards, dtype="<u8").reshape(-1, len(_SYMBOLS))
+    planes = np.unpackbits(bitboards.view(np.uint8), axis=1, bitorder="little")
+
+    rows, planes_indices = np.divmod(np.flatnonzero(planes.view(bool)), planes.shape[1])
+    counts = np.bincount(rows, minlength=len(bitboards))
+    if counts.max(initial=0) > MAX_PIECES:
+        raise ValueError(f"Positions with more than {MAX_PIECES} pieces")
+    slots = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+    piece_squares = np.full(
+        (len(bitboards), MAX_PIECES), NUM_PIECE_SQUARES, dtype=np.int16
+    )
+    piece_squares[rows, slots] = _COLUMNS[planes_indices]
+    signs = np.zeros((len(bitboards), MAX_PIECES), dtype=np.int8)
+    signs[rows, slots] = _SIGNS[planes_indices]
+
+    phases = popcount(bitboards) @ _PHASES
+    phases = np.minimum(phases, MAX_PHASE) / MAX_PHASE
+
+    white_pawns, black_pawns = bitboards[:, 0], bitboards[:, 6]
+    white_king, black_king = bitboards[:, 5], bitboards[:, 11]
+    pawn_terms = np.stack(
+        pawn_structure_terms(white_pawns, black_pawns)
+        + king_shield_terms(white_pawns, black_pawns, white_king, black_king),
+        axis=1,
+    ).astype(np.int8)
+
+    return Features(
+        piece_squares,
+        signs,
+        phases.astype(np.float32),
+        pawn_terms,
+        np.asarray(results, dtype=np.float32),
+    )
+
+
+def load_dataset(
+    lines: Iterable[str],
+    chunk_size: int = _CHUNK_SIZE,
+    limit: Optional[int] = None,
+) -> Features:
+    """Features of the positions of an EPD or FEN data set, see `read_positions`."""
+    features = []
+    placements, results = [], []
+    for count, (placement, result) in enumerate(read_positions(lines), 1):
+        placements.append(placement)
+        results.append(result)
+        if len(placements) == chunk_size or count == limit:
+            features.append(extract_features(placement_bitboards(placements), results))
+            placements, results = [], []
+        if count == limit:
+            break
+    if placements:
+        features.append(extract_features(placement_bitboards(placements), results))
+    if not features:
+        return extract_features(np.zeros((0, len(_SYMBOLS))), [])
+    return Features.concatenate(features)
+
+
+def weights_to_parameters(weights: dict) -> np.ndarray:
+    """Parameters in pawns of weights as returned by `get_weights`."""
+    return (
+        np.concatenate(
+            [
+                np.ravel(weights["middlegame"]),
+                np.ravel(weights["endgame"]),
+                weights["pawn_structure"],
+                weights["king_shield"],
+            ]
+        )
+        / EVALUATION_SCALE
+    )
+
+
+def parameters_to_weights(parameters: np.ndarray) -> dict:
+    """Weights for `set_weights` and `save_weights`, rounded to the evaluation units."""
+    values = np.round(np.asarray(parameters) * EVALUATION_SCALE).astype(np.int64)
+    pawn_terms = 2 * NUM_PIECE_SQUARES + len(PAWN_STRUCTURE_WEIGHTS)
+    return {
+        "middlegame": values[:NUM_PIECE_SQUARES].reshape(6, 64),
+        "endgame": values[NUM_PIECE_SQUARES : 2 * NUM_PIECE_SQUARES].reshape(6, 64),
+        "pawn_structure": values[2 * NUM_PIECE_SQUARES : pawn_terms],
+        "king_shield": values[pawn_terms:],
+    }
+
+
+def _split(parameters: np.ndarray):
+    # The tables get a zero entry for the padding column
+    middlegame = np.append(parameters[:NUM_PIECE_SQUARES], 0.0)
+    endgame = np.append(parameters[NUM_PIECE_SQUARES : 2 * NUM_PIECE_SQUARES], 0.0)
+    return middlegame, endgame, parameters[2 * NUM_PIECE_SQUARES :]
+
+
+def _evaluate_chunk(chunk: Features, middlegame, endgame, pawn_weights):
+    signs = chunk.signs.astype(np.float64)
+    middlegame = (middlegame[chunk.piece_squares] * signs).sum(axis=1)
+    endgame = (endgame[chunk.piece_squares] * signs).sum(axis=1)
+    tapered = chunk.phases * middlegame + (1 - chunk.phases) * endgame
+    return tapered + chunk.pawn_terms @ pawn_weights
+
+
+def evaluate_features(features: Features, parameters: np.ndarray) -> np.ndarray:
+    """Complete evaluations in pawns from white's point of view."""
+    weights = _split(parameters)
+    return np.concatenate(
+        [_evaluate_chunk(chunk, *weights) for chunk in features.chunks()]
+        or [np.zeros(0)]
+    )
+
+
+def _sigmoid(values: np.ndarray) -> np.ndarray:
+    return 0.5 * (1 + np.tanh(0.5 * values))
+
+
+def loss(features: Features, parameters: np.ndarray, scaling: float) -> float:
+    values = evaluate_features(features, parameters)
+    return float(np.mean((features.results - _sigmoid(scaling * values)) ** 2))
+
+
+def fit_scaling(
+    features: Features,
+    parameters: np.ndarray,
+    low: float = 0.01,
+    high: float = 10.0,
+    iterations: int = 50,
+) -> float:
+    """Factor of the sigmoid which best maps evaluations in pawns to results."""
+    values = evaluate_features(features, parameters)
+
+    def error(scaling: float) -> float:
+        return float(np.mean((features.results - _sigmoid(scaling * values)) ** 2))
+
+    # Golden section search
+    ratio = (np.sqrt(5) - 1) / 2
+    for _ in range(iterations):
+        left = high - ratio * (high - low)
+        right = low + ratio * (high - low)
+        if error(left) < error(right):
+            high = right
+        else:
+            low = left
+    return (low + high) / 2
+
+
+def gradient(
+    features: Features, parameters: np.ndarray, scaling: float
+) -> Tuple[float, np.ndarray]:
+    """The loss and its gradient by the parameters."""
+    middlegame, endgame, pawn_weights = _split(parameters)
+    middlegame_gradient = np.zeros(NUM_PIECE_SQUARES + 1)
+    endgame_gradient = np.zeros(NUM_PIECE_SQUARES + 1)
+    pawn_gradient = np.zeros(_PAWN_TERMS)
+    squared_error = 0.0
+    for chunk in features.chunks():
+        values = _evaluate_chunk(chunk, middlegame, endgame, pawn_weights)
+        predictions = _sigmoid(scaling * values)
+        errors = chunk.results - predictions
+        squared_error += float(errors @ errors)
+
+        # Derivative of the loss by the evaluation of every position, spread
+        # over the columns of its pieces
+        slopes = -2 * scaling * errors * predictions * (1 - predictions)
+        slopes /= len(features)
+        columns = chunk.piece_squares.ravel()
+        signed = chunk.signs * slopes[:, np.newaxis]
+        phases = chunk.phases[:, np.newaxis]
+        middlegame_gradient += np.bincount(
+            columns,
+            weights=(signed * phases).ravel(),
+            minlength=NUM_PIECE_SQUARES + 1,
+        )
+        endgame_gradient += np.bincount(
+            columns,
+            weights=(signed * (1 - phases)).ravel(),
+            minlength=NUM_PIECE_SQUARES + 1,
+        )
+        pawn_gradient += slopes @ chunk.pawn_terms
+
+    return squared_error / max(len(features), 1), np.concatenate(
+        [middlegame_gradient[:-1], endgame_gradient[:-1], pawn_gradient]
+    )
+
+
+def tune(
+    features: Features,
+    parameters: np.ndarray,
+    scaling: float,
+    epochs: int = 500,
+    learning_rate: float = 0.002,
+    callback: Optional[Callable[[int, float], None]] = None,
+) -> np.ndarray:
+    """Fit the parameters to the results with full batch Adam.
+
+    `callback` is called with the epoch and the loss before its update.
+    """
+    parameters = np.array(parameters, dtype=np.float64)
+    first_moment = np.zeros_like(parameters)
+    second_moment = np.zeros_like(parameters)
+    beta1, beta2, epsilon = 0.9, 0.999, 1e-8
+
+    for epoch in range(1, epochs + 1):
+        error, direction = gradient(features, parameters, scaling)
+        if callback is not None:
+            callback(epoch, error)
+
+        first_moment = beta1 * first_moment + (1 - beta1) * direction
+        second_moment = beta2 * second_moment + (1 - beta2) * direction**2
+        step = first_moment / (1 - beta1**epoch)
+        step /= np.sqrt(second_moment / (1 - beta2**epoch)) + epsilon
+        parameters -= learning_rate * step
+    return parameters
@@ -1,7 +1,16 @@
 import pytest
 
 import chess
+import numpy as np
 from heckmeckengine.engine.evaluation import Evaluation, EvaluationTarget
+from heckmeckengine.engine.heckmeck_board import HeckmeckBoard
+from heckmeckengine.engine.nnue import Network, save_network
+from heckmeckengine.engine.piece_square_tables import MAX_PHASE
+from heckmeckengine.engine.pawn_structure import (
+    king_shield_value,
+    pawn_structure_value,
+    popcount,
+)
 
 test_cases = [
     "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
@@ -10,6 +19,7 @@ test_cases = [
     "r2q1rk1/pP1p2pp/Q4n2/bbp1p3/Np6/1B3NBn/pPPP1PPP/R3K2R b KQ - 0 1",
     "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
     "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+    "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3",
 ]
 
 
@@ -50,3 +60,182 @@ def test_evaluation_sign(fen, color, sign, eval_target):
     evaluation = Evaluation(board).get(eval_target, color)
 
     assert sign * evaluation > 1
+
+
+@pytest.mark.parametrize("fen", test_cases)
+def test_incremental_evaluation(fen):
+    # Castling, en passant and promotions all have to update the accumulators
+    board = HeckmeckBoard(fen=fen)
+    evaluation = Evaluation(board)
+    initial = evaluation.get(EvaluationTarget.COMPLETE, chess.WHITE)
+
+    for move in list(board.legal_moves):
+        board.push(move)
+        reference = Evaluation(chess.Board(board.fen()))
+        for eval_target in EvaluationTarget:
+            assert evaluation.get(eval_target, chess.WHITE) == reference.get(
+                eval_target, chess.WHITE
+            )
+        board.pop()
+
+    assert evaluation.get(EvaluationTarget.COMPLETE, chess.WHITE) == initial
+
+
+@pytest.mark.parametrize("color", chess.COLORS)
+@pytest.mark.parametrize(
+    "eval_target", [EvaluationTarget.COMPLETE, EvaluationTarget.FAST]
+)
+def test_evaluate_batch(color, eval_target):
+    boards = [chess.Board(fen) for fen in test_cases]
+    boards += [board.mirror() for board in boards]
+    boards += [
+        chess.Board("k7/1Q6/1K6/8/8/8/8/8 b - - 0 1"),  # Checkmate
+        chess.Board("k7/8/1QK5/8/8/8/8/8 b - - 0 1"),  # Stalemate
+    ]
+
+    values = Evaluation(chess.Board()).evaluate_batch(boards, eval_target, color)
+    expected = [Evaluation(board).get(eval_target, color).value for board in boards]
+    assert values.tolist() == expected
+
+
+def test_evaluation_cache():
+    board = HeckmeckBoard()
+    evaluation = Evaluation(board, cache_size=1024)
+    for line in (["g1f3", "g8f6", "b1c3"], ["b1c3", "g8f6", "g1f3"]):
+        for move in line:
+            board.push_uci(move)
+        reference = Evaluation(chess.Board(board.fen()))
+        assert evaluation.get(EvaluationTarget.COMPLETE, chess.WHITE) == reference.get(
+            EvaluationTarget.COMPLETE, chess.WHITE
+        )
+        for _ in line:
+            board.pop()
+
+    # The second move order transposes into the cached position
+    assert (evaluation.cache_hits, evaluation.cache_misses) == (1, 1)
+
+    evaluation.clear_cache()
+    assert evaluation.cache_hits == evaluation.cache_misses == 0
+
+
+@pytest.mark.parametrize(
+    "fen, pawn_value, shield_value",
+    [
+        (chess.STARTING_FEN, 0, 0),
+        ("4k3/8/8/8/8/8/P7/4K3 w - - 0 1", -500, 0),  # Isolated, passed
+        ("4k3/8/8/8/8/P7/P7/4K3 w - - 0 1", -1500, 0),  # Doubled
+        ("4k3/8/8/2p5/8/1P1P4/8/4K3 w - - 0 1", -1000, 500),
+        ("4k3/8/3p4/8/2P5/1P6/8/4K3 w - - 0 1", 2000, -500),
+        ("4k3/8/8/2p5/4P3/3P4/8/4K3 w - - 0 1", 2200, 500),  # Backward d3
+    ],
+)
+def test_pawn_structure(fen, pawn_value, shield_value):
+    board = chess.Board(fen)
+    white_pawns = board.pieces_mask(chess.PAWN, chess.WHITE)
+    black_pawns = board.pieces_mask(chess.PAWN, chess.BLACK)
+    assert pawn_structure_value(white_pawns, black_pawns) == pawn_value
+    assert (
+        king_shield_value(
+            white_pawns,
+            black_pawns,
+            board.pieces_mask(chess.KING, chess.WHITE),
+            board.pieces_mask(chess.KING, chess.BLACK),
+        )
+        == shield_value
+    )
+
+    mirrored = board.mirror()
+    assert (
+        pawn_structure_value(
+            mirrored.pieces_mask(chess.PAWN, chess.WHITE),
+            mirrored.pieces_mask(chess.PAWN, chess.BLACK),
+        )
+        == -pawn_value
+    )
+
+
+def test_popcount():
+    bitboards = [0, 1, chess.BB_ALL, chess.BB_RANK_2 | chess.BB_H8, 1 << 63]
+    counts = [bin(bitboard).count("1") for bitboard in bitboards]
+    assert [popcount(bitboard) for bitboard in bitboards] == counts
+    assert popcount(np.array(bitboards, dtype=np.uint64)).tolist() == counts
+
+
+def test_pawn_hash():
+    board = HeckmeckBoard()
+    evaluation = Evaluation(board)
+    for move in ["g1f3", "g8f6", "f3g1", "f6g8"]:
+        board.push_uci(move)
+        evaluation.get(EvaluationTarget.COMPLETE, chess.WHITE)
+
+    # Only knights moved, the pawn structure is evaluated once
+    assert (evaluation.pawn_hash_hits, evaluation.pawn_hash_misses) == (3, 1)
+
+
+def test_tapered_evaluation():
+    board = HeckmeckBoard()
+    assert board.phase == MAX_PHASE
+
+    # Without pieces the endgame tables pull the king to the center
+    board = HeckmeckBoard("8/p7/8/4k3/8/8/P7/K7 w - - 0 1")
+    assert board.phase == 0
+    assert Evaluation(board).get(EvaluationTarget.COMPLETE, chess.WHITE) < 0
+
+
+@pytest.fixture
+def network(tmp_path):
+    # Random weights, large enough that the activations are not all clipped
+    rng = np.random.default_rng(0)
+    path = str(tmp_path / "network.bin")
+    save_network(
+        path,
+        feature_weights=rng.integers(-40, 40, (768, 64)),
+        feature_bias=rng.integers(0, 60, 64),
+        l1_weights=rng.integers(-64, 64, (128, 16)),
+        l1_bias=rng.integers(-2000, 2000, 16),
+        output_weights=rng.integers(-64, 64, 16),
+        output_bias=np.array([0]),
+    )
+    return Network(path)
+
+
+@pytest.mark.parametrize("fen", test_cases)
+def test_network_evaluation(fen, network):
+    board = HeckmeckBoard(fen=fen)
+    evaluation = Evaluation(board, network=network)
+    initial = evaluation.get(EvaluationTarget.COMPLETE, chess.WHITE)
+
+    for move in list(board.legal_moves):
+        board.push(move)
+        assert np.array_equal(board.accumulator, network.accumulator(board))
+        reference = Evaluation(chess.Board(board.fen()), network=network)
+        assert evaluation.get(EvaluationTarget.COMPLETE, chess.WHITE) == reference.get(
+            EvaluationTarget.COMPLETE, chess.WHITE
+        )
+        board.pop()
+
+    assert evaluation.get(EvaluationTarget.COMPLETE, chess.WHITE) == initial
+
+    mirrored = Evaluation(board.mirror(), network=network)
+    assert mirrored.get(EvaluationTarget.COMPLETE, chess.BLACK) == initial
+
+
+@pytest.mark.parametrize("color", chess.COLORS)
+def test_network_evaluate_batch(color, network):
+    boards = [chess.Board(fen) for fen in test_cases]
+    boards += [board.mirror() for board in boards]
+
+    evaluation = Evaluation(chess.Board(), network=network)
+    values = evaluation.evaluate_batch(boards, EvaluationTarget.COMPLETE, color)
+    expected = [
+        Evaluation(board, network=network).get(EvaluationTarget.COMPLETE, color).value
+        for board in boards
+    ]
+    assert values.tolist() == expected
+
+
+def test_network_file(tmp_path, network):
+    path = tmp_path / "truncated.bin"
+    path.write_bytes(open(network.path, "rb").read()[:-1])
+    with pytest.raises(ValueError):
+        Network(str(path))
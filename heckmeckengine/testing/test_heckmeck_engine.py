@@ -0,0 +1,97 @@
+import pytest
+
+import chess
+import numpy as np
+import threading
+from heckmeckengine.engine import HeckmeckEngine
+from heckmeckengine.engine.nnue import save_network
+from heckmeckengine.engine.score import MATE_VALUE
+
+
+def test_reuse_expected_line():
+    engine = HeckmeckEngine(hash_size_mb=1, max_depth=4)
+    engine.ucinewgame()
+    engine.set_position(None, [])
+
+    engine.play()
+    first_search = engine.last_search
+    expected_line = first_search.principal_variation
+    moves = [chess.Move.from_uci(move.uci()) for move in expected_line[:2]]
+
+    # The opponent plays the expected reply, the search continues deeper
+    engine.set_position(None, moves)
+    engine.play()
+    second_search = engine.last_search
+    assert second_search.statistics.root_searches < (
+        first_search.statistics.root_searches
+    )
+    assert second_search.completed_depth == 4
+
+    # After a new game nothing is carried over
+    engine.ucinewgame()
+    engine.set_position(None, moves)
+    engine.play()
+    assert engine.last_search.statistics.root_searches == (
+        first_search.statistics.root_searches
+    )
+
+
+def test_expected_mate():
+    engine = HeckmeckEngine(hash_size_mb=1, max_depth=6)
+    engine.ucinewgame()
+    engine.set_position("k7/8/2K5/8/8/8/8/7R", [])
+
+    engine.play()
+    first_search = engine.last_search
+    assert first_search.value == MATE_VALUE - 3
+    moves = [
+        chess.Move.from_uci(move.uci())
+        for move in first_search.principal_variation[:2]
+    ]
+
+    # Stopped at once, the search keeps the expected mate one ply away
+    stop_event = threading.Event()
+    stop_event.set()
+    engine.set_position("k7/8/2K5/8/8/8/8/7R", moves)
+    engine.play(stop_event=stop_event)
+    assert engine.last_search.value == MATE_VALUE - 1
+    assert engine.last_search.score == first_search.score
+
+
+@pytest.mark.parametrize(
+    "fen",
+    [
+        "K7/1q6/1k6/8/8/8/8/8",  # Checkmate
+        "K7/8/1qk5/8/8/8/8/8",  # Stalemate
+    ],
+)
+def test_no_legal_moves(fen):
+    engine = HeckmeckEngine(hash_size_mb=1, max_depth=2)
+    engine.ucinewgame()
+    engine.set_position(fen, [])
+
+    assert engine.play() == chess.Move.null()
+    assert engine.ponder_move is None
+
+
+def test_clear_eval_file(tmp_path):
+    rng = np.random.default_rng(0)
+    path = str(tmp_path / "network.bin")
+    save_network(
+        path,
+        feature_weights=rng.integers(-40, 40, (768, 8)),
+        feature_bias=rng.integers(0, 60, 8),
+        l1_weights=rng.integers(-64, 64, (16, 4)),
+        l1_bias=rng.integers(-2000, 2000, 4),
+        output_weights=rng.integers(-64, 64, 4),
+        output_bias=np.array([0]),
+    )
+    engine = HeckmeckEngine(hash_size_mb=1, max_depth=2)
+    engine.ucinewgame()
+    engine.set_option("EvalFile", path)
+    assert engine.board.network is not None
+
+    engine.set_option("EvalFile", "<empty>")
+    assert engine.board.network is None
+    assert engine.board.accumulator is None
+    assert engine.evaluation.network is None
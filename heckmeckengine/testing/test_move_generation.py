@@ -1,6 +1,7 @@
 import pytest
 
 import chess
+import chess.polyglot
 import numpy as np
 
 from heckmeckengine.engine import HeckmeckBoard, AnnotatedMove
@@ -134,3 +135,126 @@ def test_generate_move(position, fast):
         assert nodes == position["nodes"][depth - 1]
     else:
         raise NotImplementedError
+
+
+@pytest.mark.parametrize("position", perft_positions)
+def test_zobrist_key(position):
+    board = HeckmeckBoard(fen=position["fen"])
+    assert board.zobrist_key == chess.polyglot.zobrist_hash(board)
+
+    for move in board.generate_sorted_legal_moves(pv_move=None):
+        board.push(move)
+        assert board.zobrist_key == chess.polyglot.zobrist_hash(board)
+        for reply in board.generate_sorted_legal_moves(pv_move=None):
+            board.push(reply)
+            assert board.zobrist_key == chess.polyglot.zobrist_hash(board)
+            board.pop()
+        board.pop()
+
+    assert board.zobrist_key == chess.polyglot.zobrist_hash(board)
+    assert board.mirror().zobrist_key == chess.polyglot.zobrist_hash(board.mirror())
+
+
+def _pawn_hash(board):
+    # Polyglot keys of the pawns only
+    pawns = chess.BaseBoard(board.board_fen())
+    pawns.set_piece_map(
+        {
+            square: piece
+            for square, piece in board.piece_map().items()
+            if piece.piece_type == chess.PAWN
+        }
+    )
+    return chess.polyglot.ZobristHasher(
+        chess.polyglot.POLYGLOT_RANDOM_ARRAY
+    ).hash_board(pawns)
+
+
+@pytest.mark.parametrize("position", perft_positions)
+def test_pawn_key(position):
+    board = HeckmeckBoard(fen=position["fen"])
+    assert board.pawn_key == _pawn_hash(board)
+
+    for move in board.generate_sorted_legal_moves(pv_move=None):
+        board.push(move)
+        assert board.pawn_key == _pawn_hash(board)
+        board.pop()
+    assert board.pawn_key == _pawn_hash(board)
+
+
+@pytest.mark.parametrize("position", perft_positions)
+def test_generate_captures_only(position):
+    board = HeckmeckBoard(fen=position["fen"])
+    moves = [
+        move.uci()
+        for move in board.generate_sorted_legal_moves(pv_move=None, captures_only=True)
+    ]
+
+    if board.is_check():  # All evasions are generated
+        expected_moves = {move.uci() for move in board.legal_moves}
+    else:
+        expected_moves = {
+            move.uci()
+            for move in board.legal_moves
+            if (board.is_capture(move) or move.promotion)
+            and move.promotion in (None, chess.QUEEN)
+        }
+    assert len(moves) == len(set(moves))
+    assert set(moves) == expected_moves
+
+
+def test_killer_and_history_order():
+    board = HeckmeckBoard()
+    killer_move = AnnotatedMove(chess.B1, chess.C3)
+    board.add_killer_move(killer_move)
+    board.add_history(AnnotatedMove(chess.G2, chess.G3), 3)
+
+    moves = [move.uci() for move in board.generate_sorted_legal_moves(pv_move=None)]
+    assert moves[:2] == ["b1c3", "g2g3"]
+    assert len(moves) == len(set(moves)) == 20
+
+    board.push(killer_move)
+    moves = [move.uci() for move in board.generate_sorted_legal_moves(pv_move=None)]
+    assert moves[0] != "b1c3"
+
+
+@pytest.mark.parametrize(
+    "fen, move, value",
+    [
+        ("1k1r4/1pp4p/p7/4p3/8/P5P1/1PP4P/2K1R3 w - - 0 1", "e1e5", 100),
+        ("1k1r3q/1ppn3p/p4b2/4p3/8/P2N2P1/1PP1R1BP/2K1Q3 w - - 0 1", "d3e5", -200),
+        ("3rk3/3r4/8/3p4/8/8/3R4/3R2K1 w - - 0 1", "d2d5", -400),
+        ("4k3/3r4/8/3p4/8/8/3R4/3R2K1 w - - 0 1", "d2d5", 100),
+        ("4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1", "e5d6", 100),
+    ],
+)
+def test_see(fen, move, value):
+    board = HeckmeckBoard(fen=fen)
+    assert board.see(chess.Move.from_uci(move)) == value
+
+
+def test_losing_captures_order():
+    board = HeckmeckBoard(fen="3rk3/3r4/8/3p4/8/8/3R4/3R2K1 w - - 0 1")
+    moves = [move.uci() for move in board.generate_sorted_legal_moves(pv_move=None)]
+    assert moves[-1] == "d2d5"
+
+    moves = [
+        move.uci()
+        for move in board.generate_sorted_legal_moves(
+            pv_move=None, captures_only=True, skip_losing_captures=True
+        )
+    ]
+    assert moves == []
+
+
+def test_draw_by_rule():
+    board = HeckmeckBoard()
+    for move in ["g1f3", "g8f6", "f3g1"]:
+        board.push_uci(move)
+        assert not board.is_draw_by_rule()
+    board.push_uci("f6g8")
+    assert board.is_draw_by_rule()
+
+    assert HeckmeckBoard("8/8/4k3/8/8/3NK3/8/8 w - - 0 1").is_draw_by_rule()
+    assert not HeckmeckBoard("8/8/4k3/8/8/3RK3/8/8 w - - 0 1").is_draw_by_rule()
+    assert HeckmeckBoard("8/8/4k3/8/8/3RK3/8/8 w - - 100 80").is_draw_by_rule()
@@ -0,0 +1,37 @@
+import pytest
+
+import chess
+from heckmeckengine.engine import SearchLimits
+
+
+def test_no_time_limits():
+    assert SearchLimits().time_limits(chess.WHITE) == (None, None)
+    assert SearchLimits(depth=3).time_limits(chess.WHITE) == (None, None)
+    assert SearchLimits(wtime=1000, infinite=True).time_limits(chess.WHITE) == (
+        None,
+        None,
+    )
+
+
+def test_movetime():
+    soft, hard = SearchLimits(movetime=1000).time_limits(chess.BLACK)
+    assert soft == hard
+    assert 0.9 < hard < 1.0
+
+
+@pytest.mark.parametrize("color", chess.COLORS)
+def test_clock(color):
+    limits = SearchLimits(wtime=60000, btime=10000, winc=1000, binc=0)
+    soft, hard = limits.time_limits(color)
+    time_left = 60 if color == chess.WHITE else 10
+
+    assert 0 < soft <= hard <= time_left / 2
+    if color == chess.WHITE:
+        assert soft > 1
+
+
+def test_last_move_before_time_control():
+    limits = SearchLimits(wtime=2000, movestogo=1)
+    soft, hard = limits.time_limits(chess.WHITE)
+    assert soft == hard
+    assert soft < 2
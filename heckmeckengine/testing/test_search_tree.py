@@ -0,0 +1,324 @@
+import pytest
+
+import chess
+import multiprocessing
+import threading
+import time
+from heckmeckengine.engine import (
+    AnnotatedMove,
+    Evaluation,
+    HeckmeckBoard,
+    LazySMP,
+    RootSplitPool,
+    Score,
+    SearchMode,
+    SearchTree,
+    TranspositionTable,
+)
+from heckmeckengine.engine import search_tree
+from heckmeckengine.engine.score import INFINITE_VALUE
+
+test_cases = [
+    "r1bqk1nr/pppp1ppp/2n5/2b1p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - -",
+    "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+]
+
+
+# Disables all pruning whose result depends on the search window
+UNPRUNED = dict(
+    null_move_reduction=None,
+    late_move_reduction=None,
+    futility_margin=None,
+    razoring_margin=None,
+)
+
+
+def search(fen, search_mode, depth, **kwargs):
+    board = HeckmeckBoard(fen=fen)
+    tree = SearchTree(
+        board=board,
+        color=board.turn,
+        evaluation=Evaluation(board),
+        max_depth=depth,
+        start_depth=1,
+        transposition_table=TranspositionTable(size_mb=1),
+        search_mode=search_mode,
+        **kwargs,
+    )
+    move = tree.traverse_tree()
+    assert board.fen() == fen or board.epd() == fen
+    return move, tree
+
+
+@pytest.mark.parametrize("fen", test_cases)
+@pytest.mark.parametrize("search_mode", list(SearchMode))
+def test_search_modes_agree(fen, search_mode):
+    _, reference = search(fen, SearchMode.ALPHA_BETA, 3, **UNPRUNED)
+    _, tree = search(fen, search_mode, 3, **UNPRUNED)
+    assert tree.score == reference.score
+
+
+@pytest.mark.parametrize("search_mode", list(SearchMode))
+def test_finds_mate_in_one(search_mode):
+    move, tree = search("6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1", search_mode, 2)
+    assert move.uci() == "a1a8"
+    assert tree.score.termination == chess.Termination.CHECKMATE
+
+
+@pytest.mark.parametrize(
+    "fen, expect_cutoffs",
+    [
+        (test_cases[0], True),
+        ("8/8/4k3/8/2p5/8/3PK3/8 w - - 0 1", False),  # Pawn endgame
+    ],
+)
+def test_null_move_pruning(fen, expect_cutoffs):
+    _, tree = search(fen, SearchMode.ALPHA_BETA, 4)
+    assert (tree.statistics.null_move_cutoffs > 0) == expect_cutoffs
+
+
+def test_late_move_reductions_and_futility_pruning():
+    _, reference = search(test_cases[0], SearchMode.ALPHA_BETA, 3, **UNPRUNED)
+    _, tree = search(test_cases[0], SearchMode.ALPHA_BETA, 3)
+
+    assert tree.statistics.late_move_reductions > 0
+    assert tree.statistics.futility_pruned_moves > 0
+    assert tree.statistics.nodes < reference.statistics.nodes
+
+
+def test_large_late_move_reduction():
+    # The reduced depth must not drop below the quiescence search
+    options = dict(UNPRUNED, late_move_reduction=3)
+    move, tree = search(test_cases[0], SearchMode.ALPHA_BETA, 4, **options)
+    assert move is not None
+    assert tree.statistics.late_move_reductions > 0
+    assert tree.statistics.seldepth < 20
+
+
+def test_stop_event():
+    fen = test_cases[0]
+    board = HeckmeckBoard(fen=fen)
+    stop_event = multiprocessing.Event()
+    stop_event.set()
+    tree = SearchTree(
+        board=board,
+        color=board.turn,
+        evaluation=Evaluation(board),
+        max_depth=6,
+        start_depth=1,
+        stop_event=stop_event,
+    )
+
+    # The first iteration is too short to be stopped
+    move = tree.traverse_tree()
+    assert move is not None
+    assert tree.statistics.nodes < 1000
+    assert board.fen() == fen
+
+
+def test_lazy_smp():
+    lazy_smp = LazySMP(num_helpers=2, hash_size_mb=1)
+    try:
+        board = HeckmeckBoard(fen=test_cases[0])
+        tree = lazy_smp.search(board, Evaluation(board), max_depth=3)
+        assert tree.principal_variation[0] in board.legal_moves
+        assert lazy_smp.helper_nodes > 0
+    finally:
+        lazy_smp.close()
+
+
+def test_lazy_smp_dead_helper():
+    lazy_smp = LazySMP(num_helpers=2, hash_size_mb=1)
+    try:
+        board = HeckmeckBoard(fen=test_cases[0])
+
+        def kill_helper(depth):
+            helper = lazy_smp._helpers[0]
+            helper.kill()
+            helper.join()
+
+        # The search finishes without the result of the killed helper
+        tree = lazy_smp.search(
+            board, Evaluation(board), max_depth=3, iteration_callback=kill_helper
+        )
+        assert tree.principal_variation[0] in board.legal_moves
+
+        # The next search restarts it
+        lazy_smp.search(board, Evaluation(board), max_depth=3)
+        assert all(helper.is_alive() for helper in lazy_smp._helpers)
+        assert lazy_smp.helper_nodes > 0
+    finally:
+        lazy_smp.close()
+
+
+def test_lazy_smp_main_search_error():
+    lazy_smp = LazySMP(num_helpers=2, hash_size_mb=1)
+    try:
+        board = HeckmeckBoard(fen=test_cases[0])
+
+        def fail(depth):
+            raise RuntimeError()
+
+        # The helpers are stopped and their results collected
+        with pytest.raises(RuntimeError):
+            lazy_smp.search(
+                board, Evaluation(board), max_depth=20, iteration_callback=fail
+            )
+        assert lazy_smp._stop_event.is_set()
+        assert lazy_smp._results.empty()
+    finally:
+        lazy_smp.close()
+
+
+def test_root_split():
+    pool = RootSplitPool(num_workers=2, hash_size_mb=1)
+    try:
+        _, reference = search(test_cases[0], SearchMode.ALPHA_BETA, 3, **UNPRUNED)
+        _, tree = search(
+            test_cases[0], SearchMode.ALPHA_BETA, 3, root_split_pool=pool, **UNPRUNED
+        )
+        assert tree.score == reference.score
+        assert tree.statistics.nodes > 0
+    finally:
+        pool.close()
+
+
+def test_root_split_stop():
+    pool = RootSplitPool(num_workers=1, hash_size_mb=1)
+    try:
+        board = HeckmeckBoard(fen=test_cases[2])
+        move = next(board.generate_sorted_legal_moves())
+        future = pool.submit(
+            board, move, 20, -INFINITE_VALUE, INFINITE_VALUE, 0, dict(UNPRUNED)
+        )
+        time.sleep(0.5)
+        assert future.running()
+
+        start = time.monotonic()
+        pool.stop([future])
+        assert time.monotonic() - start < 2.0
+
+        # The pool is ready for the next search
+        future = pool.submit(board, move, 1, -INFINITE_VALUE, INFINITE_VALUE, 0, {})
+        score, _, _, _ = future.result()
+        assert isinstance(score, int)
+    finally:
+        pool.close()
+
+
+def test_root_split_repetition():
+    # White is lost unless it repeats the position with Kg1. The knight moves
+    # come first, so Kg1 is searched by a worker.
+    board = HeckmeckBoard(fen="k7/8/8/8/8/8/r7/4N2K w - - 0 1")
+    for move in ["h1g1", "a8b8", "g1h1", "b8a8"]:
+        board.push_uci(move)
+    pool = RootSplitPool(num_workers=2, hash_size_mb=1)
+    try:
+        scores = []
+        for root_split_pool in [None, pool]:
+            tree = SearchTree(
+                board=board,
+                color=board.turn,
+                evaluation=Evaluation(board),
+                max_depth=2,
+                start_depth=2,
+                transposition_table=TranspositionTable(size_mb=1),
+                root_split_pool=root_split_pool,
+                **UNPRUNED,
+            )
+            assert tree.traverse_tree().uci() == "h1g1"
+            scores.append(tree.score)
+        assert scores[0] == scores[1] == Score(0.0)
+    finally:
+        pool.close()
+
+
+@pytest.mark.parametrize("search_mode", list(SearchMode))
+def test_node_limit(search_mode):
+    move, tree = search(test_cases[0], search_mode, 20, node_limit=3000)
+    assert move is not None
+    assert tree.completed_depth < 20
+    assert tree.statistics.nodes + tree.statistics.quiescence_nodes < 3000 + 1024
+
+
+def test_stop_in_failed_low_window(monkeypatch):
+    # Check the node limit at every node
+    monkeypatch.setattr(search_tree, "_STOP_CHECK_INTERVAL", 1)
+    board = HeckmeckBoard()
+    tree = SearchTree(
+        board=board,
+        color=board.turn,
+        evaluation=Evaluation(board),
+        max_depth=4,
+        start_depth=4,
+        search_mode=SearchMode.PVS,
+        principal_variation=[AnnotatedMove.from_uci("e2e4")],
+        value=1000,
+        node_limit=30,
+    )
+
+    # Stopped in the first aspiration window, where every root move fails low
+    move = tree.traverse_tree()
+    assert tree.statistics.aspiration_re_searches == 0
+    assert move.uci() == "e2e4"
+
+
+def test_hard_time_limit():
+    start = time.monotonic()
+    move, tree = search(test_cases[2], SearchMode.PVS, 20, hard_time_limit=0.5)
+    assert move is not None
+    assert time.monotonic() - start < 2.0
+
+
+def test_ponderhit():
+    ponderhit_event = threading.Event()
+    timer = threading.Timer(0.5, ponderhit_event.set)
+    start = time.monotonic()
+    timer.start()
+
+    # The time limit only starts with the ponderhit
+    move, tree = search(
+        test_cases[2],
+        SearchMode.PVS,
+        20,
+        hard_time_limit=0.3,
+        ponderhit_event=ponderhit_event,
+    )
+    elapsed = time.monotonic() - start
+    assert move is not None
+    assert 0.8 <= elapsed < 2.0
+
+
+def test_search_info():
+    infos = []
+    _, tree = search(test_cases[0], SearchMode.PVS, 3, info_callback=infos.append)
+
+    assert [info.depth for info in infos] == [1, 2, 3]
+    assert infos[-1].score == tree.score
+    assert infos[-1].principal_variation == tree.principal_variation
+    assert infos[-1].nodes == tree.statistics.total_nodes
+    assert infos[-1].seldepth >= 3
+
+    statistics = tree.statistics
+    assert len(statistics.iteration_nodes) == 3
+    assert statistics.effective_branching_factor > 0
+    assert 0 < statistics.first_move_cutoff_rate <= 1
+    assert 0 < statistics.transposition_hit_rate < 1
+
+
+@pytest.mark.parametrize(
+    "fen, mate",
+    [
+        ("6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1", 1),
+        ("k7/8/1K6/8/8/8/8/7R b - - 0 1", -1),
+    ],
+)
+@pytest.mark.parametrize("search_mode", list(SearchMode))
+def test_mate_distance(fen, mate, search_mode):
+    infos = []
+    _, tree = search(fen, search_mode, 20, info_callback=infos.append)
+
+    # The search ends once the mate is found within the searched depth
+    assert infos[-1].mate == mate
+    assert tree.completed_depth <= 2 * abs(mate)
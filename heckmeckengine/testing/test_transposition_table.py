@@ -0,0 +1,87 @@
+import pytest
+
+import chess
+from heckmeckengine.engine import AnnotatedMove
+from heckmeckengine.engine.score import MATE_VALUE
+from heckmeckengine.engine.transposition_table import Bound, TranspositionTable
+
+
+def test_store_and_probe():
+    table = TranspositionTable(size_mb=1)
+    move = AnnotatedMove(chess.E7, chess.E8, chess.QUEEN)
+    table.store(12345, 4, Bound.LOWER, 150, move)
+
+    entry = table.probe(12345)
+    assert entry.depth == 4
+    assert entry.bound == Bound.LOWER
+    assert entry.score == 150
+    assert entry.move == move
+
+    assert table.probe(12346) is None
+    assert table.hits == 1
+    assert table.probes == 2
+
+
+def test_store_mate():
+    table = TranspositionTable(size_mb=1)
+    table.store(1, 2, Bound.EXACT, -MATE_VALUE, None)
+
+    entry = table.probe(1)
+    assert entry.score == -MATE_VALUE
+    assert entry.move is None
+
+
+@pytest.mark.parametrize(
+    "new_search, depth, replaced",
+    [
+        (False, 2, False),
+        (False, 3, True),
+        (True, 2, True),
+    ],
+)
+def test_replacement(new_search, depth, replaced):
+    table = TranspositionTable(size_mb=1)
+    key = 7
+    other_key = key + table.size  # Same slot
+
+    table.store(key, 3, Bound.EXACT, 100, None)
+    if new_search:
+        table.new_search()
+    table.store(other_key, depth, Bound.EXACT, 200, None)
+
+    assert (table.probe(other_key) is not None) == replaced
+    assert (table.probe(key) is not None) != replaced
+
+
+def test_same_position_keeps_move():
+    table = TranspositionTable(size_mb=1)
+    move = AnnotatedMove(chess.G1, chess.F3)
+    table.store(5, 3, Bound.EXACT, 100, move)
+    table.store(5, 1, Bound.UPPER, 50, None)
+
+    entry = table.probe(5)
+    assert entry.depth == 1
+    assert entry.move == move
+
+
+def test_shared_table():
+    table = TranspositionTable(size_mb=1, shared=True)
+    attached = TranspositionTable.attach(table.name, table.size_mb)
+
+    move = AnnotatedMove(chess.E2, chess.E4)
+    table.store(777, 3, Bound.EXACT, 25, move)
+    entry = attached.probe(777)
+    assert entry.score == 25
+    assert entry.move == move
+
+    attached.close()
+    table.close()
+
+
+def test_torn_entry_is_rejected():
+    table = TranspositionTable(size_mb=1)
+    table.store(42, 3, Bound.EXACT, 25, None)
+
+    # Simulate a concurrent writer that only replaced the score
+    table._scores[(42 % table.size) * 3 + 2] = 100
+    assert table.probe(42) is None
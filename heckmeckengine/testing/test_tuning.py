@@ -0,0 +1,152 @@
+import pytest
+
+import chess
+import numpy as np
+from heckmeckengine.engine.evaluation import (
+    Evaluation,
+    EvaluationTarget,
+    board_bitboards,
+    evaluate_bitboards,
+    get_weights,
+    load_weights,
+    reset_weights,
+    save_weights,
+)
+from heckmeckengine.engine.heckmeck_board import HeckmeckBoard
+from heckmeckengine.engine.piece_square_tables import EVALUATION_SCALE
+from heckmeckengine.engine.tuning import (
+    NUM_PARAMETERS,
+    evaluate_features,
+    extract_features,
+    fit_scaling,
+    gradient,
+    load_dataset,
+    loss,
+    parameters_to_weights,
+    placement_bitboards,
+    read_positions,
+    tune,
+    weights_to_parameters,
+)
+
+test_cases = [
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq -",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - -",
+    "r2q1rk1/pP1p2pp/Q4n2/bbp1p3/Np6/1B3NBn/pPPP1PPP/R3K2R b KQ - 0 1",
+    "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+    "4k3/8/8/2p5/4P3/3P4/8/4K3 w - - 0 1",
+    "8/p7/8/4k3/8/8/P7/K7 w - - 0 1",
+]
+
+
+@pytest.fixture
+def dataset():
+    # The results are the predictions of the evaluation with a scaling of one
+    lines = []
+    for fen in test_cases:
+        board = chess.Board(fen)
+        for move in board.legal_moves:
+            board.push(move)
+            evaluation = Evaluation(board).get(EvaluationTarget.COMPLETE, chess.WHITE)
+            lines.append(f"{board.fen()} [{1 / (1 + np.exp(-evaluation.value)):.4f}]")
+            board.pop()
+    return load_dataset(lines, chunk_size=100)
+
+
+def test_read_positions():
+    lines = [
+        'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - c9 "1-0";',
+        'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - c9 "1/2-1/2";',
+        "8/p7/8/4k3/8/8/P7/K7 w - - 0 1 [0.0]",
+        "8/p7/8/4k3/8/8/P7/K7 b - - 0 1 0-1",
+        "8/p7/8/4k3/8/8/P7/K7 w - - 0 1 [.75]",
+        "8/p7/8/4k3/8/8/P7/K7 w - - 0 1",
+    ]
+    results = [result for _, result in read_positions(lines)]
+    assert results == [1.0, 0.5, 0.0, 0.0, 0.75]
+
+
+def test_placement_bitboards():
+    placements = [fen.split()[0] for fen in test_cases]
+    expected = [board_bitboards(chess.BaseBoard(placement)) for placement in placements]
+    assert placement_bitboards(placements).tolist() == expected
+
+    with pytest.raises(ValueError):
+        placement_bitboards(["8/8/8/8/8/8/8/K6"])
+
+
+def test_features():
+    boards = [chess.Board(fen) for fen in test_cases]
+    boards += [board.mirror() for board in boards]
+    bitboards = np.array([board_bitboards(board) for board in boards], dtype=np.uint64)
+    features = extract_features(bitboards, np.zeros(len(boards)))
+
+    # The tapered evaluation rounds down to the evaluation units
+    parameters = weights_to_parameters(get_weights())
+    expected = evaluate_bitboards(bitboards, EvaluationTarget.COMPLETE)
+    values = evaluate_features(features, parameters) * EVALUATION_SCALE
+    assert np.abs(values - expected).max() <= 1
+
+    weights = parameters_to_weights(parameters)
+    for name, value in get_weights().items():
+        assert np.array_equal(weights[name], value)
+
+
+def test_gradient(dataset):
+    rng = np.random.default_rng(0)
+    parameters = weights_to_parameters(get_weights())
+    parameters = parameters + rng.normal(0, 0.1, NUM_PARAMETERS)
+    error, direction = gradient(dataset, parameters, 0.8)
+    assert error == pytest.approx(loss(dataset, parameters, 0.8))
+
+    step = 1e-4
+    for index in [12, 300, 384 + 70, 2 * 384, NUM_PARAMETERS - 1]:
+        offset = np.zeros(NUM_PARAMETERS)
+        offset[index] = step
+        difference = (
+            loss(dataset, parameters + offset, 0.8)
+            - loss(dataset, parameters - offset, 0.8)
+        ) / (2 * step)
+        assert direction[index] == pytest.approx(difference, rel=1e-4, abs=1e-10)
+
+
+def test_tune(dataset):
+    rng = np.random.default_rng(0)
+    initial = weights_to_parameters(get_weights())
+    parameters = initial + rng.normal(0, 0.3, NUM_PARAMETERS)
+
+    scaling = fit_scaling(dataset, initial)
+    assert scaling == pytest.approx(1.0, abs=0.05)
+
+    tuned = tune(dataset, parameters, scaling, epochs=200, learning_rate=0.01)
+    assert loss(dataset, tuned, scaling) < loss(dataset, parameters, scaling) / 2
+
+
+def test_load_weights(tmp_path):
+    fen = "4k3/p7/8/8/8/8/P7/4K1N1 w - - 0 1"
+    board = HeckmeckBoard(fen)
+    default = Evaluation(board).get(EvaluationTarget.COMPLETE, chess.WHITE)
+
+    weights = get_weights()
+    weights["middlegame"][chess.KNIGHT - 1, chess.G1] += 5000
+    weights["endgame"][chess.KNIGHT - 1, chess.G1] += 5000
+    path = str(tmp_path / "weights.npz")
+    save_weights(path, weights)
+    try:
+        load_weights(path)
+        board = HeckmeckBoard(fen)
+        changed = Evaluation(board).get(EvaluationTarget.COMPLETE, chess.WHITE)
+        assert changed.value == pytest.approx(default.value + 0.5)
+
+        reference = Evaluation(chess.Board(fen))
+        assert reference.get(EvaluationTarget.COMPLETE, chess.WHITE) == changed
+        values = reference.evaluate_batch(
+            [chess.Board(fen)], EvaluationTarget.COMPLETE, chess.WHITE
+        )
+        assert values.tolist() == [changed.value]
+    finally:
+        reset_weights()
+
+    board = HeckmeckBoard(fen)
+    assert Evaluation(board).get(EvaluationTarget.COMPLETE, chess.WHITE) == default
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+
+import argparse
+import time
+
+from heckmeckengine.engine import (
+    Evaluation,
+    HeckmeckBoard,
+    LazySMP,
+    ParallelMode,
+    RootSplitPool,
+    SearchMode,
+    SearchTree,
+    TranspositionTable,
+)
+
+POSITIONS = [
+    "r1bqk1nr/pppp1ppp/2n5/2b1p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4",
+    "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+]
+
+
+def benchmark_lazy_smp(processes: int, depth: int, hash_size_mb: int, options):
+    # Time to depth and nodes per second summed over all positions
+    lazy_smp = LazySMP(processes - 1, hash_size_mb)
+    elapsed = 0.0
+    nodes = 0
+    for fen in POSITIONS:
+        lazy_smp.transposition_table.clear()
+        board = HeckmeckBoard(fen=fen)
+
+        start = time.perf_counter()
+        tree = lazy_smp.search(board, Evaluation(board), max_depth=depth, **options)
+        elapsed += time.perf_counter() - start
+        nodes += (
+            tree.statistics.nodes
+            + tree.statistics.quiescence_nodes
+            + lazy_smp.helper_nodes
+        )
+    lazy_smp.close()
+    return elapsed, nodes
+
+
+def benchmark_root_split(processes: int, depth: int, hash_size_mb: int, options):
+    # Pool start up is excluded, it is paid once per engine and not per move
+    pool = RootSplitPool(processes, hash_size_mb) if processes > 1 else None
+    elapsed = 0.0
+    nodes = 0
+    for fen in POSITIONS:
+        board = HeckmeckBoard(fen=fen)
+        tree = SearchTree(
+            board=board,
+            color=board.turn,
+            evaluation=Evaluation(board),
+            max_depth=depth,
+            transposition_table=TranspositionTable(hash_size_mb),
+            root_split_pool=pool,
+            **options,
+        )
+
+        start = time.perf_counter()
+        tree.traverse_tree()
+        elapsed += time.perf_counter() - start
+        nodes += tree.statistics.nodes + tree.statistics.quiescence_nodes
+    if pool is not None:
+        pool.close()
+    return elapsed, nodes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Parallel search scaling, one CSV row per process count"
+    )
+    parser.add_argument("--max-processes", type=int, default=4)
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--hash", type=int, default=16)
+    parser.add_argument(
+        "--search-mode",
+        type=SearchMode,
+        default=SearchMode.ALPHA_BETA,
+        choices=list(SearchMode),
+    )
+    parser.add_argument(
+        "--parallel-mode",
+        type=ParallelMode,
+        default=ParallelMode.LAZY_SMP,
+        choices=list(ParallelMode),
+    )
+    arguments = parser.parse_args()
+
+    if arguments.parallel_mode == ParallelMode.LAZY_SMP:
+        benchmark = benchmark_lazy_smp
+    else:
+        benchmark = benchmark_root_split
+    options = dict(search_mode=arguments.search_mode)
+
+    print("processes,time_to_depth,nodes,nps,speedup")
+    reference = None
+    for processes in range(1, arguments.max_processes + 1):
+        elapsed, nodes = benchmark(
+            processes, arguments.depth, arguments.hash, options
+        )
+        if reference is None:
+            reference = elapsed
+        print(
+            f"{processes},{elapsed:.3f},{nodes},{nodes / elapsed:.0f},"
+            f"{reference / elapsed:.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
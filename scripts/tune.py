@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+
+import argparse
+import time
+
+from heckmeckengine.engine.evaluation import get_weights, load_weights, save_weights
+from heckmeckengine.engine.tuning import (
+    fit_scaling,
+    load_dataset,
+    loss,
+    parameters_to_weights,
+    tune,
+    weights_to_parameters,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Fit the weights of the handcrafted evaluation to game results"
+    )
+    parser.add_argument("dataset", help="EPD or FEN lines with a result each")
+    parser.add_argument("output", help="Weights file for the WeightsFile option")
+    parser.add_argument("--initial", help="Weights file to start from")
+    parser.add_argument("--limit", type=int, help="Use only the first positions")
+    parser.add_argument("--epochs", type=int, default=500)
+    parser.add_argument("--learning-rate", type=float, default=0.002)
+    parser.add_argument("--scaling", type=float, help="Skip fitting the sigmoid")
+    parser.add_argument("--report-every", type=int, default=25)
+    arguments = parser.parse_args()
+
+    start = time.perf_counter()
+    with open(arguments.dataset) as dataset:
+        features = load_dataset(dataset, limit=arguments.limit)
+    print(f"Loaded {len(features)} positions in {time.perf_counter() - start:.1f}s")
+
+    if arguments.initial is not None:
+        load_weights(arguments.initial)
+    parameters = weights_to_parameters(get_weights())
+    scaling = arguments.scaling
+    if scaling is None:
+        scaling = fit_scaling(features, parameters)
+    print(f"Scaling {scaling:.4f}, loss {loss(features, parameters, scaling):.6f}")
+
+    def report(epoch: int, error: float):
+        if epoch % arguments.report_every == 0:
+            print(f"Epoch {epoch}, loss {error:.6f}")
+
+    start = time.perf_counter()
+    parameters = tune(
+        features,
+        parameters,
+        scaling,
+        epochs=arguments.epochs,
+        learning_rate=arguments.learning_rate,
+        callback=report,
+    )
+    print(
+        f"Loss {loss(features, parameters, scaling):.6f} after "
+        f"{time.perf_counter() - start:.1f}s"
+    )
+    save_weights(arguments.output, parameters_to_weights(parameters))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,8 +4,16 @@ import chess
 import sys
 import logging
 import multiprocessing
+import threading
 
-from heckmeckengine.engine import HeckmeckEngine, Engine
+from heckmeckengine.engine import (
+    HeckmeckEngine,
+    Engine,
+    ParallelMode,
+    SearchInfo,
+    SearchLimits,
+    SearchMode,
+)
 
 logging.basicConfig(level=logging.DEBUG)
 
@@ -26,6 +34,21 @@ class Unbuffered(object):
 
 out = Unbuffered(sys.stdout)
 
+# Arguments of the go command followed by a number
+GO_INTEGER_ARGUMENTS = (
+    "wtime",
+    "btime",
+    "winc",
+    "binc",
+    "movestogo",
+    "movetime",
+    "depth",
+    "nodes",
+)
+
+# Seconds between two polls for commands while the engine is searching
+POLL_INTERVAL = 0.01
+
 
 def output(*values: object):
     print(*values, file=out)
@@ -36,6 +59,21 @@ def register_engine(engine: Engine):
     author = engine.author
     output("id", name)
     output("id", author)
+    output("option name Hash type spin default 16 min 1 max 4096")
+    output("option name Threads type spin default 1 min 1 max 64")
+    output("option name Ponder type check default false")
+    output("option name EvalFile type string default <empty>")
+    output("option name WeightsFile type string default <empty>")
+    output(
+        "option name SearchMode type combo default",
+        SearchMode.ALPHA_BETA.value,
+        *(f"var {mode.value}" for mode in SearchMode),
+    )
+    output(
+        "option name ParallelMode type combo default",
+        ParallelMode.LAZY_SMP.value,
+        *(f"var {mode.value}" for mode in ParallelMode),
+    )
     output("uciok")
 
 
@@ -43,6 +81,13 @@ def ucinewgame(engine: Engine):
     engine.ucinewgame()
 
 
+def set_option(engine: Engine, *arguments):
+    value_index = arguments.index("value") if "value" in arguments else None
+    name = " ".join(arguments[1:value_index])
+    value = None if value_index is None else " ".join(arguments[value_index + 1 :])
+    engine.set_option(name, value)
+
+
 def setup_position(engine: Engine, *arguments):
     fen = arguments[0]
     if fen == "startpos":
@@ -51,30 +96,91 @@ def setup_position(engine: Engine, *arguments):
     engine.set_position(fen, moves)
 
 
-def parse_go(*arguments):
-    return None
+def parse_go(*arguments) -> SearchLimits:
+    limits = SearchLimits()
+    arguments = iter(arguments)
+    for argument in arguments:
+        if argument == "infinite":
+            limits.infinite = True
+        elif argument == "ponder":
+            limits.ponder = True
+        elif argument in GO_INTEGER_ARGUMENTS:
+            setattr(limits, argument, int(next(arguments)))
+    return limits
+
+
+def format_score(info: SearchInfo) -> str:
+    if info.mate is not None:
+        return f"mate {info.mate}"
+    return f"cp {info.score.to_int()}"
+
+
+def send_info(info: SearchInfo):
+    fields = [
+        f"depth {info.depth}",
+        f"seldepth {info.seldepth}",
+        f"time {round(info.time * 1000)}",
+        f"nodes {info.nodes}",
+        f"nps {info.nps}",
+    ]
+    if info.score is not None:
+        fields.append(f"score {format_score(info)}")
+    if info.principal_variation:
+        fields.append("pv " + " ".join(move.uci() for move in info.principal_variation))
+    output("info", *fields)
 
 
 def search_next_move(engine: Engine, connection, *arguments):
-    parsed_arguments = parse_go(*arguments)
+    limits = parse_go(*arguments)
+    stop_event = threading.Event()
+    ponderhit_event = threading.Event()
+    searching = True
+    quit = False
 
-    def iteration_callback(search_depth):
-        stop = False
-        while connection.poll():
+    def listen():
+        # Commands arriving during the search, stop is handled inside the search
+        nonlocal quit
+        while searching:
+            if not connection.poll(POLL_INTERVAL):
+                continue
             command = connection.recv()
 
             if command.startswith("debug"):
                 pass
             elif command.startswith("stop"):
-                stop = True
+                stop_event.set()
+            elif command.startswith("ponderhit"):
+                ponderhit_event.set()
+            elif command.startswith("quit"):
+                quit = True
+                stop_event.set()
             elif command.startswith("isready"):
                 output("readyok")
             else:
-                raise ValueError(command)
-        return stop
-
-    bestmove = engine.play(iteration_callback=iteration_callback)
-    output("bestmove", bestmove)
+                logging.warning(f"Ignoring {command} during search")
+
+    listener = threading.Thread(target=listen)
+    listener.start()
+    bestmove = engine.play(
+        limits=limits,
+        stop_event=stop_event,
+        ponderhit_event=ponderhit_event,
+        info_callback=send_info,
+    )
+    # The best move must not be sent before stop, or ponderhit when pondering
+    if limits.infinite or limits.ponder:
+        while not stop_event.is_set():
+            if limits.ponder and not limits.infinite and ponderhit_event.is_set():
+                break
+            stop_event.wait(POLL_INTERVAL)
+    searching = False
+    listener.join()
+
+    if engine.ponder_move is not None:
+        output("bestmove", bestmove, "ponder", engine.ponder_move)
+    else:
+        output("bestmove", bestmove)
+    return quit
 
 
 def run_engine(connection):
@@ -96,7 +202,8 @@ def run_engine(connection):
             logging.warning("Recieved an isready command")
             output("readyok")
         elif command.startswith("setoption"):
-            pass
+            arguments = command.split(" ")[1:]
+            set_option(engine, *arguments)
         elif command.startswith("register"):
             pass
         elif command.startswith("position"):
@@ -109,12 +216,16 @@ def run_engine(connection):
         elif command.startswith("go"):
             arguments = command.split(" ")[1:]
             connection.send(True)
-            search_next_move(engine, connection, *arguments)
+            quit = search_next_move(engine, connection, *arguments)
             connection.send(False)
         elif command.startswith("stop"):
             pass  # Not in a calculation at the moment
         elif command.startswith("ponderhit"):
-            pass
+            pass  # The ponder search has already finished
+        elif command.startswith("quit"):
+            quit = True
+
+    engine.close()
 
 
 def main() -> None:
@@ -136,7 +247,10 @@ def main() -> None:
         if command.startswith("debug"):
             connection_to_engine.send(command)
         elif command.startswith("quit"):
-            engine_process.terminate()
+            connection_to_engine.send(command)
+            engine_process.join(timeout=5.0)
+            if engine_process.is_alive():
+                engine_process.terminate()
             quit = True
         elif command.startswith("isready") and is_computing:
             output("readyok")
@@ -2,7 +2,7 @@
 
 from setuptools import setup, find_packages
 
-install_requires = ["chess"]
+install_requires = ["chess", "numpy"]
 
 setup(
     name="heckmeckengine",